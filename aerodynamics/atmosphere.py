@@ -0,0 +1,59 @@
+from itertools import product
+
+import numpy as np
+
+from aerodynamics.ballflight import BALL_MASS, BALL_RADIUS, density, dyn_viscosity
+
+
+class Atmosphere:
+    """
+    Air properties for one or many (P, T, RH) conditions, computed once and
+    then passed into the integrators instead of recomputing them per step.
+
+    P: (int, array) Air pressure [Pa]
+    T: (int, array) Air temperature [K]
+    RH: (float, array) Relative humidity
+
+    Attributes:
+        rho: Air density [kg/m3]
+        mu: Dynamic viscosity [Pa*s]
+        re_factor: Re per m/s of ball speed, Re = re_factor*|v|
+        q: Force prefactor per unit coefficient divided by the ball mass,
+            so that the drag acceleration is -q*Cd*|v|*v
+    """
+
+    def __init__(self, P, T, RH=0):
+        self.P = P
+        self.T = T
+        self.RH = RH
+        self.rho = density(P, T, RH)
+        self.mu = dyn_viscosity(T)
+        self.re_factor = self.rho*2*BALL_RADIUS/self.mu
+        self.q = 0.5*self.rho*np.pi*BALL_RADIUS**2/BALL_MASS
+
+    @classmethod
+    def sweep(cls, P, T, RH=(0,)):
+        """
+        Returns an Atmosphere over every combination of the given values
+        """
+        P, T, RH = np.array(list(product(P, T, RH)), dtype=float).T
+        return cls(P, T, RH)
+
+    def broadcast(self, n):
+        """
+        Returns an Atmosphere with every attribute as an array of length n
+        """
+        P, T, RH = np.broadcast_arrays(*[np.asarray(i, dtype=float) for i in (self.P, self.T, self.RH)])
+        return Atmosphere(*[np.broadcast_to(i, (n,)) for i in (P, T, RH)])
+
+    def __len__(self):
+        return np.size(self.rho)
+
+    def __getitem__(self, idx):
+        air = Atmosphere.__new__(Atmosphere)
+        for name, value in vars(self).items():
+            setattr(air, name, np.asarray(value)[idx] if np.ndim(value) else value)
+        return air
+
+    def __repr__(self):
+        return f"Atmosphere(P={self.P}, T={self.T}, RH={self.RH})"
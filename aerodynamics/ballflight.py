@@ -1,9 +1,9 @@
-from scipy.interpolate import interp1d
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 import time
 from logger import log
+from aerodynamics.coefficients import drag_table
+from aerodynamics.recording import Recorder
 
 MOLAR_MASS = 28.9647/1000       # [kg/mol]
 BALL_RADIUS = 0.5*42.67/1000    # [m]
@@ -16,26 +16,14 @@ def c_drag(reynolds, mode=None, **kwargs):
     """
     Returns the coefficient of drag based on figure 2b in 
     "Aerodynamics of Golf Balls in Still Air"; Bin, Lyu et al (2018)
-    """
 
-    if mode==None or mode=='spline':
-        # Estimate CD as a cubic interpolation
-        Re_val = np.array([0.001, 10, 0.5, 0.64, 0.8, 0.96, 1.12, 1.5])*1e5
-        cd_val = np.array([0.62, 0.5, 0.65, 0.6, 0.41, 0.38, 0.39, 0.41])
-        if kwargs.get('cd') is not None:
-            cd_val = kwargs.get('cd')
-            Re_val = Re_val[:len(cd_val)]
-        cd = interp1d(Re_val, cd_val, 'cubic')
-        return cd(reynolds)
-    elif mode=='poly':
-        # Treat CD as a polynomial
-        coeff = np.array([5.86, -1.676e-4, 1.699e-9, -5.697e-15])
-        if kwargs.get('coeff') is not None:
-            coeff = kwargs.get('coeff')
-        Re = np.array([reynolds**i for i in range(len(coeff))])
-        return sum(Re*coeff)
-    else:
+    The curve is looked up in a precomputed table, see
+    coefficients.drag_table. reynolds can be a number or an array.
+    """
+    if mode not in (None, 'spline', 'poly'):
         raise Exception("mode must be either 'poly' or 'spline'")
+    table = drag_table(mode, cd=kwargs.get('cd'), coeff=kwargs.get('coeff'), kind=kwargs.get('kind', 'linear'))
+    return table(reynolds)
 
     # c=0.2
     # if reynolds < 81207.6:
@@ -100,7 +88,7 @@ def dyn_viscosity(T):
     return 2.791 * 10**(-7) * T**(0.7355)
 
 
-def drag_force(Cd, P, T, v):
+def drag_force(Cd, P, T, v, rho=None):
     """
     Returns a force vektor with the same dimensions as v.
 
@@ -108,10 +96,12 @@ def drag_force(Cd, P, T, v):
     P: (int) Air pressure [Pa]
     T: (int) Air temperature [K]
     v: (int, array) Ball velocity, can be a vector [m/s]
+    rho: (int) Air density [kg/m3], computed as dry air from P and T if not given
     """
+    if rho is None:
+        rho = MOLAR_MASS * P / (R * T)
     Ap = np.pi * BALL_RADIUS**2
-    v_unit = v/np.linalg.norm(v)
-    return Ap * MOLAR_MASS * Cd * P / (2 * R * T) * np.linalg.norm(v)**2 * -v_unit
+    return Ap * rho * Cd / 2 * np.linalg.norm(v) * -v
 
 
 def gravity_force(m):
@@ -156,29 +146,29 @@ def run(v0, P, T, spin, **kwargs):
         mode: ['spline', 'poly'],
         cd: array (only if mode='spline')
         coeff: array (only if mode='poly')
+        kind: ['linear', 'cubic'] Interpolation in the Cd table
+        RH: (float) Relative humidity, default 0
         fetch: ['spin', 'Re', 'Cd', 'F_drag', 'F_lift']
+        raw: (bool) Return (position, velocity, fetched) where fetched is a
+            dict of arrays, instead of a DataFrame
     """
     dt = TIME_STEP
 
     position = np.array([[0, 0, 0]])
     v = np.array([v0])
     mu = dyn_viscosity(T)
-    rho = density(P, T)
+    rho = density(P, T, kwargs.get('RH', 0))
     weight = gravity_force(BALL_MASS)
 
     spin_decay = (1-0.04)**dt       # 4 % decay per second, (Lyu, 2018)
 
     fetch = kwargs.get('fetch', [])
-    s = pd.Series(dtype='object')
-    for i in fetch:
-        # s[i] = np.array([])
-        s[i] = np.nan
-    df = pd.DataFrame([s]) if fetch else pd.DataFrame()
+    recorder = Recorder(fetch)
 
     while position[-1][-1] >= 0:
         Re = reynolds(v[-1], rho, 2*BALL_RADIUS, mu)
         Cd = c_drag(Re, **kwargs)
-        F_drag = drag_force(Cd, P, T, v[-1])
+        F_drag = drag_force(Cd, P, T, v[-1], rho)
         # F_lift = magnus_force(spin, v[-1], rho)
         F_lift = lift(spin, v[-1], rho)
 
@@ -190,11 +180,12 @@ def run(v0, P, T, spin, **kwargs):
         spin = np.multiply(spin, spin_decay)
 
         if fetch:
-            s = pd.Series([], dtype='object')
-            for i in fetch:
-                s[i] = locals()[i]
-            df = df.append(s, ignore_index=True)
+            recorder.record(spin=spin, Re=Re, Cd=Cd, F_drag=F_drag, F_lift=F_lift)
+
+    if kwargs.get('raw'):
+        return position, v, recorder.arrays()
 
+    df = recorder.to_frame() if fetch else pd.DataFrame()
     df.insert(0, 'position', list(position))
     df.insert(1, 'velocity', list(v))
     df['density'] = rho
@@ -203,8 +194,10 @@ def run(v0, P, T, spin, **kwargs):
 
 
 def plot_cd(start=0.5*1e5, end=1*1e6, **kwargs):
+    # matplotlib is only imported when plotting
+    import matplotlib.pyplot as plt
     Re = np.linspace(start, end)
-    cd = np.array([c_drag(i, **kwargs) for i in Re])
+    cd = c_drag(Re, **kwargs)
     plt.plot(Re*10**(-5), cd)
     plt.grid()
     plt.title("Coefficient of drag")
@@ -216,6 +209,7 @@ def plot_cd(start=0.5*1e5, end=1*1e6, **kwargs):
 
 
 def plot_ballpath(pos):
+    import matplotlib.pyplot as plt
     fig, (ax1, ax2) = plt.subplots(2,1)
 
     x = [p[0] for p in pos]
@@ -239,6 +233,7 @@ def plot_forces(**kwargs):
     if not kwargs:
         return None
     
+    import matplotlib.pyplot as plt
     i=0
     fig, ax = plt.subplots(1,4)
     for k, v in kwargs.items():
@@ -0,0 +1,227 @@
+import hashlib
+import io
+import sqlite3
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from aerodynamics import integrator
+from aerodynamics.atmosphere import Atmosphere
+
+# Launch conditions are rounded to these number of decimals before hashing
+DECIMALS = {
+    'v0': 2,        # [m/s]
+    'spin': 2,      # [1/sec]
+    'P': 0,         # [Pa]
+    'T': 2,         # [K]
+}
+
+# Model parameters that change the result of a simulation
+MODEL_KWARGS = ('mode', 'cd', 'coeff', 'kind', 'method', 'dt', 'landing', 'rtol', 'atol', 'RH')
+
+SUMMARY_COLUMNS = ['carry', 'side', 'height', 'hang_time', 'landing_angle']
+
+
+def quantize(v0, P, T, spin):
+    """
+    Returns v0, P, T and spin rounded to DECIMALS, with negative zeros made
+    positive so that they hash the same.
+    """
+    return (
+        np.round(np.asarray(v0, dtype=float), DECIMALS['v0']) + 0.0,
+        float(np.round(float(P), DECIMALS['P'])) + 0.0,
+        float(np.round(float(T), DECIMALS['T'])) + 0.0,
+        np.round(np.asarray(spin, dtype=float), DECIMALS['spin']) + 0.0,
+    )
+
+
+def make_key(kind, v0, P, T, spin, **kwargs):
+    """
+    Returns a hash of the quantized launch conditions and model parameters.
+    """
+    v0, P, T, spin = quantize(v0, P, T, spin)
+    launch = (v0.tolist(), spin.tolist(), P, T)
+    model = []
+    for name in MODEL_KWARGS:
+        value = kwargs.get(name)
+        if isinstance(value, (np.ndarray, list, tuple)):
+            value = (np.asarray(value, dtype=float) + 0.0).tolist()
+        elif isinstance(value, float):
+            value += 0.0
+        model.append((name, value))
+    text = repr((kind, launch, model))
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def _to_bytes(arrays):
+    buffer = io.BytesIO()
+    np.savez(buffer, *arrays)
+    return buffer.getvalue()
+
+
+def _from_bytes(data):
+    with np.load(io.BytesIO(data)) as npz:
+        return tuple(npz[f"arr_{i}"] for i in range(len(npz.files)))
+
+
+class TrajectoryCache:
+    """
+    Memoizes ball-flight simulations keyed by quantized launch conditions.
+    Results are kept in memory with LRU eviction and, if path is given,
+    also in an SQLite file so they survive restarts and can be shared
+    between processes.
+
+    maxsize: (int) Max number of results kept in memory
+    path: (str) SQLite file for the on-disk store, or None
+    """
+
+    def __init__(self, maxsize=4096, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self._memory = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, data BLOB)")
+            self._db.commit()
+
+    def __len__(self):
+        return len(self._memory)
+
+    def info(self):
+        """
+        Returns hit/miss counts. Disk hits are also counted as hits.
+        """
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'size': len(self._memory),
+            'maxsize': self.maxsize,
+        }
+
+    def clear(self, disk=False):
+        self._memory.clear()
+        self.hits = self.disk_hits = self.misses = 0
+        if disk and self._db is not None:
+            self._db.execute("DELETE FROM results")
+            self._db.commit()
+
+    def get(self, key):
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return self._memory[key]
+
+        if self._db is not None:
+            row = self._db.execute("SELECT data FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                value = _from_bytes(row[0])
+                self._remember(key, value)
+                self.hits += 1
+                self.disk_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    def put(self, key, value, commit=True):
+        """
+        value: (tuple) Arrays to store
+        commit: (bool) Commit the on-disk store, can be skipped when
+            storing many results in a row
+        """
+        for array in value:
+            array.flags.writeable = False
+        self._remember(key, value)
+        if self._db is not None:
+            self._db.execute("INSERT OR REPLACE INTO results VALUES (?, ?)", (key, _to_bytes(value)))
+            if commit:
+                self._db.commit()
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def simulate(self, v0, P, T, spin, **kwargs):
+        """
+        Cached version of integrator.simulate, takes the same arguments
+        except atmosphere. The cached arrays are read-only.
+        """
+        if kwargs.get('atmosphere') is not None:
+            raise Exception("atmosphere can't be cached, pass P, T and RH")
+        # Results are simulated from the quantized inputs that the key stands for
+        v0, P, T, spin = quantize(v0, P, T, spin)
+        key = make_key('trajectory', v0, P, T, spin, **kwargs)
+        value = self.get(key)
+        if value is None:
+            position, velocity, time = integrator.simulate(v0, P, T, spin, **dict(kwargs, raw=True))
+            air = Atmosphere(P, T, kwargs.get('RH', 0))
+            rho_mu = np.array([air.rho, air.mu])
+            value = (position, velocity, time, rho_mu)
+            self.put(key, value)
+
+        position, velocity, time, (rho, mu) = value
+        if kwargs.get('raw'):
+            return position, velocity, time
+        return integrator.to_frame(position, velocity, rho, mu, time)
+
+    def simulate_batch(self, v0, spin, P, T, **kwargs):
+        """
+        Cached version of integrator.simulate_batch. Every shot is looked up
+        on its own and all misses are simulated together in one batch.
+        Returns the same summary DataFrame, the history option is not supported.
+        """
+        if kwargs.get('history') or kwargs.get('atmosphere') is not None:
+            raise Exception("history and atmosphere can't be cached, use integrator.simulate_batch")
+        n_shots = len(v0)
+        P = np.broadcast_to(np.asarray(P, dtype=float), (n_shots,))
+        T = np.broadcast_to(np.asarray(T, dtype=float), (n_shots,))
+        RH = np.broadcast_to(np.asarray(kwargs.pop('RH', 0), dtype=float), (n_shots,))
+
+        launch = [quantize(v0[i], P[i], T[i], spin[i]) for i in range(n_shots)]
+        keys = [make_key('summary', *launch[i], RH=RH[i], **kwargs) for i in range(n_shots)]
+        summary = np.empty((n_shots, len(SUMMARY_COLUMNS)))
+        missing = []
+        for i, key in enumerate(keys):
+            value = self.get(key)
+            if value is None:
+                missing.append(i)
+            else:
+                summary[i] = value[0]
+
+        if missing:
+            v0_q, P_q, T_q, spin_q = [np.array(i) for i in zip(*[launch[i] for i in missing])]
+            result = integrator.simulate_batch(v0_q, spin_q, P_q, T_q, RH=RH[missing], **kwargs)
+            values = result[SUMMARY_COLUMNS].to_numpy()
+            summary[missing] = values
+            for i, row in zip(missing, values):
+                self.put(keys[i], (row.copy(),), commit=False)
+            if self._db is not None:
+                self._db.commit()
+
+        return pd.DataFrame(summary, columns=SUMMARY_COLUMNS)
+
+
+default_cache = TrajectoryCache()
+
+
+def simulate(v0, P, T, spin, **kwargs):
+    """
+    integrator.simulate memoized in the module wide default_cache
+    """
+    return default_cache.simulate(v0, P, T, spin, **kwargs)
+
+
+def simulate_batch(v0, spin, P, T, **kwargs):
+    """
+    integrator.simulate_batch memoized in the module wide default_cache
+    """
+    return default_cache.simulate_batch(v0, spin, P, T, **kwargs)
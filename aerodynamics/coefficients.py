@@ -0,0 +1,114 @@
+import math
+
+import numpy as np
+
+# Cd data from figure 2b in "Aerodynamics of Golf Balls in Still Air"
+RE_VALUES = np.array([0.001, 10, 0.5, 0.64, 0.8, 0.96, 1.12, 1.5])*1e5
+CD_VALUES = np.array([0.62, 0.5, 0.65, 0.6, 0.41, 0.38, 0.39, 0.41])
+CD_COEFF = np.array([5.86, -1.676e-4, 1.699e-9, -5.697e-15])
+
+TABLE_SIZE = 8192
+POLY_RANGE = (0, 1e6)
+
+_tables = {}
+
+
+class CoefficientTable:
+    """
+    Dense lookup table of a coefficient curve on an evenly spaced grid.
+    Values outside the grid are clamped to the end points.
+
+    x: (array) Evenly spaced grid
+    y: (array) Coefficient at every grid point
+    kind: ['linear', 'cubic'] Interpolation between the grid points
+    """
+
+    def __init__(self, x, y, kind='linear'):
+        if kind not in ('linear', 'cubic'):
+            raise Exception("kind must be either 'linear' or 'cubic'")
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.kind = kind
+        self.x0 = float(self.x[0])
+        self.dx = float(self.x[1] - self.x[0])
+        self.last = len(self.y) - 1
+        self._y = self.y.tolist()
+
+    def __call__(self, x):
+        if np.ndim(x) == 0:
+            return self._lookup(float(x))
+
+        u = np.clip((np.asarray(x, dtype=float) - self.x0)/self.dx, 0, self.last)
+        i = np.minimum(u.astype(int), self.last - 1)
+        s = u - i
+        y = self.y
+        if self.kind == 'linear':
+            return y[i] + s*(y[i+1] - y[i])
+
+        # Catmull-Rom spline through the neighbouring grid points
+        p0 = y[np.maximum(i-1, 0)]
+        p1, p2 = y[i], y[i+1]
+        p3 = y[np.minimum(i+2, self.last)]
+        return p1 + 0.5*s*(p2 - p0 + s*(2*p0 - 5*p1 + 4*p2 - p3 + s*(3*(p1 - p2) + p3 - p0)))
+
+    def _lookup(self, x):
+        """
+        Same as __call__ for a single float, without the numpy overhead
+        """
+        u = min(max((x - self.x0)/self.dx, 0.0), self.last)
+        i = min(int(u), self.last - 1)
+        s = u - i
+        y = self._y
+        if self.kind == 'linear':
+            return y[i] + s*(y[i+1] - y[i])
+
+        p0 = y[max(i-1, 0)]
+        p1, p2 = y[i], y[i+1]
+        p3 = y[min(i+2, self.last)]
+        return p1 + 0.5*s*(p2 - p0 + s*(2*p0 - 5*p1 + 4*p2 - p3 + s*(3*(p1 - p2) + p3 - p0)))
+
+
+def _key(values):
+    return None if values is None else tuple(np.asarray(values, dtype=float).tolist())
+
+
+def drag_table(mode=None, cd=None, coeff=None, kind='linear'):
+    """
+    Returns a CoefficientTable of Cd(Re). The table is built once for every
+    set of parameters and then reused.
+
+    mode: ['spline', 'poly'], see ballflight.c_drag
+    cd: array (only if mode='spline')
+    coeff: array (only if mode='poly')
+    kind: ['linear', 'cubic']
+    """
+    if mode is None:
+        mode = 'spline'
+    key = ('drag', mode, _key(cd), _key(coeff), kind)
+    if key in _tables:
+        return _tables[key]
+
+    if mode == 'spline':
+        Re_val = RE_VALUES
+        cd_val = CD_VALUES
+        if cd is not None:
+            cd_val = cd
+            Re_val = Re_val[:len(cd_val)]
+        # scipy is slow to import and only needed to build the table
+        from scipy.interpolate import interp1d
+        Re = np.linspace(Re_val.min(), Re_val.max(), TABLE_SIZE)
+        values = interp1d(Re_val, cd_val, 'cubic')(Re)
+    elif mode == 'poly':
+        if coeff is None:
+            coeff = CD_COEFF
+        Re = np.linspace(*POLY_RANGE, TABLE_SIZE)
+        values = np.polyval(np.asarray(coeff)[::-1], Re)
+    else:
+        raise Exception("mode must be either 'poly' or 'spline'")
+
+    _tables[key] = CoefficientTable(Re, values, kind)
+    return _tables[key]
+
+
+def clear_tables():
+    _tables.clear()
@@ -0,0 +1,409 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from aerodynamics.ballflight import (
+    BALL_MASS,
+    BALL_RADIUS,
+    TIME_STEP,
+    gravity_force,
+)
+from aerodynamics.atmosphere import Atmosphere
+from aerodynamics.coefficients import drag_table
+
+GRAVITY = gravity_force(BALL_MASS) / BALL_MASS
+G_Z = float(GRAVITY[2])
+SPIN_DECAY = 1 - 0.04       # 4 % decay per second, (Lyu, 2018)
+
+
+def acceleration(v, spin, re_factor, q, cd):
+    """
+    Returns the acceleration [m/s2] from gravity, drag and lift as a tuple.
+    Works on plain floats since numpy has a large overhead on 3-vectors.
+
+    v: (tuple) Ball velocity [m/s]
+    spin: (tuple) Revolutions per second [1/sec]
+    re_factor, q: (float) Precomputed air factors, see Atmosphere
+    cd: function Re -> Cd, see coefficients.drag_table
+    """
+    vx, vy, vz = v
+    sx, sy, sz = spin
+    v_norm = math.sqrt(vx*vx + vy*vy + vz*vz)
+    spin_norm = math.sqrt(sx*sx + sy*sy + sz*sz)
+
+    q = q*v_norm
+    drag = q*cd(re_factor*v_norm)
+    ax, ay, az = -drag*vx, -drag*vy, -drag*vz + G_Z
+
+    if spin_norm > 0:
+        # |spin x v| = |spin|*|v|*sin(angle), so the lift in ballflight.lift
+        # reduces to Cl*|v|*(spin x v)/|spin| without any arccos
+        Cl = -0.05 + math.sqrt(0.0025 + 0.36*BALL_RADIUS*2*math.pi*spin_norm/v_norm)
+        lift = q*Cl/spin_norm
+        ax += lift*(sy*vz - sz*vy)
+        ay += lift*(sz*vx - sx*vz)
+        az += lift*(sx*vy - sy*vx)
+    return ax, ay, az
+
+
+def batch_acceleration(v, spin, re_factor, q, cd):
+    """
+    Vectorized version of acceleration for N balls at once.
+
+    v: (array) Ball velocities, shape (N, 3) [m/s]
+    spin: (array) Revolutions per second, shape (N, 3) [1/sec]
+    re_factor, q: (array) Precomputed air factors, shape (N,), see Atmosphere
+    cd: function Re -> Cd, see coefficients.drag_table
+    """
+    v_norm = np.sqrt(np.einsum('ij,ij->i', v, v))
+    spin_norm = np.sqrt(np.einsum('ij,ij->i', spin, spin))
+
+    q = q*v_norm
+    drag = q*cd(re_factor*v_norm)
+    Cl = -0.05 + np.sqrt(0.0025 + 0.36*BALL_RADIUS*2*np.pi*spin_norm/v_norm)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lift = np.where(spin_norm > 0, q*Cl/spin_norm, 0.0)
+
+    return -drag[:, None]*v + lift[:, None]*np.cross(spin, v) + GRAVITY
+
+
+def estimate_steps(v0, dt):
+    """
+    Returns a generous guess of the number of steps of a flight, based on
+    the hang time in vacuum.
+    """
+    vz = max(float(np.max(np.asarray(v0)[..., 2])), 0.0)
+    return int(1.5*(2*vz/9.82 + 1)/dt) + 2
+
+
+def _grow(array):
+    new = np.empty((2*len(array),) + array.shape[1:])
+    new[:len(array)] = array
+    return new
+
+
+def to_frame(position, velocity, rho, mu, time=None):
+    """
+    Returns the trajectory as a DataFrame with the same columns as
+    ballflight.run, plus the time of every point if given.
+    """
+    df = pd.DataFrame()
+    df.insert(0, 'position', list(position))
+    df.insert(1, 'velocity', list(velocity))
+    df['density'] = rho
+    df['viscosity'] = mu
+    if time is not None:
+        df['time'] = time
+    return df
+
+
+def _axpy(a, x, y):
+    """
+    Returns a*x + y for tuples x and y
+    """
+    return tuple(a*xi + yi for xi, yi in zip(x, y))
+
+
+def step_euler(f, t, y, h):
+    return _axpy(h, f(t, y), y)
+
+
+def step_rk4(f, t, y, h):
+    k1 = f(t, y)
+    k2 = f(t + h/2, _axpy(h/2, k1, y))
+    k3 = f(t + h/2, _axpy(h/2, k2, y))
+    k4 = f(t + h, _axpy(h, k3, y))
+    return tuple(yi + h/6*(a + 2*b + 2*c + d) for yi, a, b, c, d in zip(y, k1, k2, k3, k4))
+
+
+# Dormand-Prince 5(4) coefficients
+DOPRI_C = (0, 1/5, 3/10, 4/5, 8/9, 1, 1)
+DOPRI_A = (
+    (),
+    (1/5,),
+    (3/40, 9/40),
+    (44/45, -56/15, 32/9),
+    (19372/6561, -25360/2187, 64448/6561, -212/729),
+    (9017/3168, -355/33, 46732/5247, 49/176, -5103/18656),
+    (35/384, 0, 500/1113, 125/192, -2187/6784, 11/84),
+)
+DOPRI_B = (35/384, 0, 500/1113, 125/192, -2187/6784, 11/84, 0)
+DOPRI_E = (
+    35/384 - 5179/57600, 0, 500/1113 - 7571/16695, 125/192 - 393/640,
+    -2187/6784 + 92097/339200, 11/84 - 187/2100, -1/40,
+)
+
+
+def step_rk45(f, t, y, h, rtol=1e-6, atol=1e-6):
+    """
+    Takes one adaptive Dormand-Prince step. The step is retried with a
+    smaller h until the local error estimate is within tolerance.
+
+    Returns (y_new, h_used, h_next)
+    """
+    while True:
+        k = []
+        for c, a in zip(DOPRI_C, DOPRI_A):
+            yi = y
+            for aj, kj in zip(a, k):
+                if aj:
+                    yi = _axpy(h*aj, kj, yi)
+            k.append(f(t + c*h, yi))
+
+        y_new = y
+        for b, kj in zip(DOPRI_B, k):
+            if b:
+                y_new = _axpy(h*b, kj, y_new)
+
+        err = 0.0
+        for i in range(len(y)):
+            e = h*sum(ej*kj[i] for ej, kj in zip(DOPRI_E, k))
+            scale = atol + rtol*max(abs(y[i]), abs(y_new[i]))
+            err = max(err, abs(e)/scale)
+
+        factor = 5.0 if err == 0 else min(5.0, max(0.2, 0.9*err**-0.2))
+        if err <= 1:
+            return y_new, h, h*factor
+        h *= max(factor, 0.1)
+
+
+STEPPERS = {
+    'euler': step_euler,
+    'rk4': step_rk4,
+    'rk45': step_rk45,
+}
+
+
+def _hermite(s, h, p0, p1, m0, m1):
+    """
+    Cubic Hermite interpolation at s in [0, 1] of a step of length h
+    """
+    s2, s3 = s*s, s*s*s
+    return ((2*s3 - 3*s2 + 1)*p0 + (s3 - 2*s2 + s)*h*m0
+            + (-2*s3 + 3*s2)*p1 + (s3 - s2)*h*m1)
+
+
+def ground_crossing(t0, state0, t1, state1, iterations=40):
+    """
+    Returns (t, state) where the ball hits the ground (z=0) between two steps.
+    The positions are interpolated with cubic Hermite polynomials using the
+    velocities as derivatives, and the velocities linearly.
+
+    state0, state1: (array) [x, y, z, vx, vy, vz], shape (6,) or (N, 6)
+    t0, t1: (float, array) time of the states, scalar or shape (N,)
+    """
+    state0 = np.asarray(state0, dtype=float)
+    state1 = np.asarray(state1, dtype=float)
+    h = np.broadcast_to(np.asarray(t1 - t0, dtype=float), state0.shape[:-1])
+
+    # Bisection on the Hermite polynomial, z(0) >= 0 > z(1)
+    if state0.ndim == 1:
+        z0, z1, vz0, vz1, h_ = (float(i) for i in (state0[2], state1[2], state0[5], state1[5], h))
+        lo, hi = 0.0, 1.0
+        for _ in range(iterations):
+            mid = (lo + hi)/2
+            if _hermite(mid, h_, z0, z1, vz0, vz1) >= 0:
+                lo = mid
+            else:
+                hi = mid
+    else:
+        lo = np.zeros(h.shape)
+        hi = np.ones(h.shape)
+        for _ in range(iterations):
+            mid = (lo + hi)/2
+            above = _hermite(mid, h, state0[:, 2], state1[:, 2], state0[:, 5], state1[:, 5]) >= 0
+            lo = np.where(above, mid, lo)
+            hi = np.where(above, hi, mid)
+    s = np.expand_dims(np.asarray((lo + hi)/2), -1)
+
+    position = _hermite(s, np.expand_dims(h, -1), state0[..., :3], state1[..., :3], state0[..., 3:], state1[..., 3:])
+    position[..., 2] = 0
+    velocity = (1-s)*state0[..., 3:] + s*state1[..., 3:]
+    return t0 + s[..., 0]*h, np.concatenate([position, velocity], axis=-1)
+
+
+def simulate(v0, P, T, spin, dt=TIME_STEP, method='euler', **kwargs):
+    """
+    Integrates a ball flight until it hits the ground. The state is written
+    into preallocated buffers which only grow if the flight lasts longer
+    than estimated.
+
+    method: ['euler', 'rk4', 'rk45']. With 'rk45' dt is only the initial
+        step size, which is then adapted to keep the local error within
+        rtol and atol.
+
+    kwargs:
+        mode: ['spline', 'poly'],
+        cd: array (only if mode='spline')
+        coeff: array (only if mode='poly')
+        kind: ['linear', 'cubic'] Interpolation in the Cd table
+        RH: (float) Relative humidity, default 0
+        atmosphere: Prebuilt Atmosphere, P, T and RH are then ignored
+        landing: (bool) End the flight at the exact point where it crosses
+            z=0 instead of the first step below ground. Defaults to True for
+            'rk4' and 'rk45' and False for 'euler', which matches ballflight.run
+        rtol, atol: Tolerances for 'rk45' (default 1e-6)
+        raw: (bool) Return (position, velocity, time) arrays instead of a DataFrame
+    """
+    if method not in STEPPERS:
+        raise Exception(f"method must be one of {list(STEPPERS)}")
+    stepper = STEPPERS[method]
+    landing = kwargs.get('landing', method != 'euler')
+    tolerances = {'rtol': kwargs.get('rtol', 1e-6), 'atol': kwargs.get('atol', 1e-6)}
+
+    air = kwargs.get('atmosphere') or Atmosphere(P, T, kwargs.get('RH', 0))
+    re_factor, q = float(air.re_factor), float(air.q)
+    cd = drag_table(kwargs.get('mode'), cd=kwargs.get('cd'), coeff=kwargs.get('coeff'), kind=kwargs.get('kind', 'linear'))
+
+    sx, sy, sz = (float(i) for i in spin)
+
+    def f(t, state):
+        decay = SPIN_DECAY**t
+        v = state[3:]
+        return v + acceleration(v, (sx*decay, sy*decay, sz*decay), re_factor, q, cd)
+
+    n = estimate_steps(v0, dt)
+    states = np.empty((n, 6))
+    time = np.empty(n)
+
+    t = 0.0
+    state = (0.0, 0.0, 0.0) + tuple(float(i) for i in v0)
+    states[0] = state
+    time[0] = t
+
+    h = dt
+    i = 0
+    while state[2] >= 0:
+        if i+1 == len(states):
+            states = _grow(states)
+            time = _grow(time[:, None])[:, 0]
+
+        if method == 'rk45':
+            new_state, h_used, h = stepper(f, t, state, h, **tolerances)
+        else:
+            new_state, h_used = stepper(f, t, state, h), h
+        new_t = t + h_used
+
+        i += 1
+        if landing and new_state[2] < 0:
+            new_t, new_state = ground_crossing(t, state, new_t, new_state)
+            states[i] = new_state
+            time[i] = new_t
+            break
+
+        t, state = new_t, new_state
+        states[i] = state
+        time[i] = t
+
+    position = states[:i+1, :3]
+    velocity = states[:i+1, 3:]
+    time = time[:i+1]
+    if kwargs.get('raw'):
+        return position, velocity, time
+    return to_frame(position, velocity, air.rho, air.mu, time)
+
+
+def simulate_batch(v0, spin, P, T, dt=TIME_STEP, method='euler', **kwargs):
+    """
+    Integrates N ball flights in lockstep. Balls that have landed are masked
+    out, so every step only computes the forces on the balls still in the air.
+
+    v0: (array) Initial velocities, shape (N, 3) [m/s]
+    spin: (array) Revolutions per second, shape (N, 3) [1/sec]
+    P: (int, array) Air pressure, scalar or shape (N,) [Pa]
+    T: (int, array) Air temperature, scalar or shape (N,) [K]
+    method: ['euler', 'rk4']
+
+    kwargs:
+        mode: ['spline', 'poly'],
+        cd: array (only if mode='spline')
+        coeff: array (only if mode='poly')
+        kind: ['linear', 'cubic'] Interpolation in the Cd table
+        RH: (float, array) Relative humidity, scalar or shape (N,), default 0
+        atmosphere: Prebuilt Atmosphere, scalar or of length N. P, T and RH
+            are then ignored
+        landing: (bool) Interpolate the exact ground crossing of every ball,
+            see simulate. Defaults to True for 'rk4' and False for 'euler'.
+        history: (bool) Also return the positions of every step as an
+            array of shape (steps, N, 3). Landed balls keep their last position.
+
+    Returns a DataFrame with one row per shot and the columns
+    carry, side, height, hang_time and landing_angle, computed the same
+    way as the helpers in ballflight.
+    """
+    if method not in ('euler', 'rk4'):
+        raise Exception("method must be either 'euler' or 'rk4'")
+    landing = kwargs.get('landing', method != 'euler')
+
+    position = np.zeros(np.shape(v0))
+    velocity = np.array(v0, dtype=float)
+    spin0 = np.array(spin, dtype=float)
+    n_shots = len(velocity)
+
+    air = kwargs.get('atmosphere') or Atmosphere(P, T, kwargs.get('RH', 0))
+    if np.ndim(air.rho) == 0 or len(air) != n_shots:
+        air = air.broadcast(n_shots)
+    cd = drag_table(kwargs.get('mode'), cd=kwargs.get('cd'), coeff=kwargs.get('coeff'), kind=kwargs.get('kind', 'linear'))
+
+    steps = np.zeros(n_shots, dtype=int)
+    height = np.zeros(n_shots)
+    hang_time = np.zeros(n_shots)
+    active = np.ones(n_shots, dtype=bool)
+
+    history = None
+    if kwargs.get('history'):
+        history = np.empty((estimate_steps(v0, dt), n_shots, 3))
+        history[0] = position
+
+    t = 0.0
+    while active.any():
+        idx = np.flatnonzero(active)
+        p, v = position[idx], velocity[idx]
+        args = (air.re_factor[idx], air.q[idx], cd)
+        accel = lambda v, t: batch_acceleration(v, spin0[idx]*SPIN_DECAY**t, *args)
+
+        if method == 'rk4':
+            k1 = accel(v, t)
+            k2 = accel(v + dt/2*k1, t + dt/2)
+            k3 = accel(v + dt/2*k2, t + dt/2)
+            k4 = accel(v + dt*k3, t + dt)
+            new_p = p + dt/6*(v + 2*(v + dt/2*k1) + 2*(v + dt/2*k2) + v + dt*k3)
+            new_v = v + dt/6*(k1 + 2*k2 + 2*k3 + k4)
+        else:
+            new_p = p + v*dt
+            new_v = v + accel(v, t)*dt
+        t += dt
+
+        landed = new_p[:, 2] < 0
+        hang_time[idx[landed]] = dt*(steps[idx[landed]] + 2)
+        if landing and landed.any():
+            t_land, state = ground_crossing(
+                t - dt,
+                np.hstack([p[landed], v[landed]]),
+                t,
+                np.hstack([new_p[landed], new_v[landed]]))
+            new_p[landed], new_v[landed] = state[:, :3], state[:, 3:]
+            hang_time[idx[landed]] = t_land
+
+        position[idx], velocity[idx] = new_p, new_v
+        steps[idx] += 1
+        height[idx] = np.maximum(height[idx], new_p[:, 2])
+        active[idx] = ~landed
+
+        if history is not None:
+            if steps.max() == len(history):
+                history = _grow(history)
+            history[steps.max()] = position
+
+    vx, vy, vz = velocity.T
+    df = pd.DataFrame({
+        'carry': position[:, 1].round(2),
+        'side': position[:, 0].round(2),
+        'height': height.round(2),
+        'hang_time': hang_time.round(2),
+        'landing_angle': ((np.arctan(vz/vy) + np.pi/2)*180/np.pi).round(1),
+    })
+    if history is not None:
+        return df, history[:steps.max()+1]
+    return df
@@ -0,0 +1,202 @@
+import numpy as np
+import pandas as pd
+
+from aerodynamics import cache
+
+# Typical ball speed [m/s] and backspin [rpm] per club, used as first guess
+CLUB_DEFAULTS = {
+    '1W': (67, 2700),
+    '3W': (62, 3600),
+    '4': (57, 4500),
+    '5': (55, 5000),
+    '6': (53, 5800),
+    '7': (50, 6500),
+    '8': (47, 7300),
+    '9': (44, 8100),
+    'P': (41, 8800),
+    '52': (38, 9500),
+    '56': (35, 10000),
+}
+
+# Measured column in the shots table, simulated column and residual scale
+TARGETS = [
+    ('carry_distance', 'carry', 1.0),
+    ('height', 'height', 1.0),
+    ('hang_time', 'hang_time', 0.1),
+]
+
+# Finite difference steps for ball speed [m/s] and backspin [rpm]
+STEPS = np.array([0.5, 120.0])
+
+# Forward model settings, accurate with few steps and landing detection
+FORWARD_KWARGS = {'method': 'rk4', 'dt': 0.1}
+
+
+def launch_vectors(speed, launch_angle, backspin):
+    """
+    Returns (v0, spin) arrays of shape (N, 3) for straight shots.
+
+    speed: (array) Ball speed [m/s]
+    launch_angle: (array) [degrees]
+    backspin: (array) [rpm]
+    """
+    angle = np.radians(launch_angle)
+    zeros = np.zeros(len(angle))
+    v0 = speed[:, None] * np.column_stack([zeros, np.cos(angle), np.sin(angle)])
+    spin = np.column_stack([backspin/60, zeros, zeros])
+    return v0, spin
+
+
+def forward(speed, launch_angle, backspin, P, T, simulate=None):
+    """
+    Returns the simulated targets, shape (N, len(TARGETS))
+    """
+    simulate = simulate or cache.simulate_batch
+    v0, spin = launch_vectors(speed, launch_angle, backspin)
+    result = simulate(v0, spin, P, T, **FORWARD_KWARGS)
+    return result[[sim for _, sim, _ in TARGETS]].to_numpy()
+
+
+def fit(speed, launch_angle, backspin, measured, fixed_speed, P=101325, T=293,
+        max_iter=20, tol=0.05, simulate=None):
+    """
+    Fits ball speed and backspin of N shots to measured carry, height and
+    hang time with Levenberg-Marquardt. All shots are solved in lockstep,
+    every iteration runs one batch with the current guesses and their finite
+    difference perturbations. Shots stop iterating once converged.
+
+    speed, backspin: (array) Initial guesses [m/s], [rpm]
+    launch_angle: (array) [degrees]
+    measured: (array) Measured targets, shape (N, len(TARGETS)), nan if missing
+    fixed_speed: (array) bool, True where the ball speed is known
+    P, T: Air pressure [Pa] and temperature [K], scalar or shape (N,)
+    tol: (float) Converged when the scaled parameter step is below tol
+
+    Returns (params, simulated, converged) where params has the columns
+    ball speed and backspin.
+    """
+    n_shots = len(launch_angle)
+    params = np.column_stack([speed, backspin]).astype(float)
+    P = np.broadcast_to(np.asarray(P, dtype=float), (n_shots,))
+    T = np.broadcast_to(np.asarray(T, dtype=float), (n_shots,))
+
+    scale = np.array([s for _, _, s in TARGETS])
+    has_target = ~np.isnan(measured)
+    target = np.where(has_target, measured, 0)
+    free = np.column_stack([~fixed_speed, np.ones(n_shots, dtype=bool)])
+
+    def residuals(sim, idx):
+        return np.where(has_target[idx], (sim - target[idx])/scale, 0)
+
+    # Linearization at the best point found so far of every shot
+    best = params.copy()
+    best_error = np.full(n_shots, np.inf)
+    best_J = np.zeros((n_shots, len(TARGETS), 2))
+    best_r = np.zeros((n_shots, len(TARGETS)))
+
+    damping = np.full(n_shots, 1e-2)
+    simulated = np.full(measured.shape, np.nan)
+    converged = np.zeros(n_shots, dtype=bool)
+    active = has_target.any(axis=1) & ~np.isnan(params).any(axis=1) & ~np.isnan(launch_angle)
+
+    for _ in range(max_iter):
+        idx = np.flatnonzero(active)
+        if len(idx) == 0:
+            break
+        n = len(idx)
+        p = params[idx]
+
+        # Current guess and one perturbation per parameter in one batch
+        trial = np.vstack([p, p + [STEPS[0], 0], p + [0, STEPS[1]]])
+        sim = forward(
+            trial[:, 0], np.tile(launch_angle[idx], 3), trial[:, 1],
+            np.tile(P[idx], 3), np.tile(T[idx], 3), simulate)
+        base, d_speed, d_spin = sim[:n], sim[n:2*n], sim[2*n:]
+
+        r = residuals(base, idx)
+        error = np.sum(r**2, axis=1)
+        J = np.stack([(d_speed - base)/STEPS[0], (d_spin - base)/STEPS[1]], axis=-1)
+        J = np.where(has_target[idx, :, None], J/scale[:, None], 0) * free[idx, None, :]
+
+        # Keep the guess if it improved the fit, otherwise raise the damping
+        # and take a shorter step from the best point
+        improved = error < best_error[idx]
+        keep = idx[improved]
+        best[keep] = p[improved]
+        best_error[keep] = error[improved]
+        best_J[keep] = J[improved]
+        best_r[keep] = r[improved]
+        simulated[keep] = base[improved]
+        damping[idx] = np.where(improved, damping[idx]/3, damping[idx]*4)
+
+        # Damped normal equations, fixed parameters get an identity row
+        J, r = best_J[idx], best_r[idx]
+        JTJ = np.einsum('nki,nkj->nij', J, J)
+        diag = np.einsum('nii->ni', JTJ)
+        A = JTJ + np.eye(2)*(damping[idx, None]*(diag + 1e-9) + ~free[idx])[:, None, :]
+        g = np.einsum('nki,nk->ni', J, r)
+        delta = -np.linalg.solve(A, g[..., None])[..., 0]
+
+        new = best[idx] + delta
+        new[:, 0] = np.clip(new[:, 0], 5, 100)
+        new[:, 1] = np.clip(new[:, 1], 0, 15000)
+        params[idx] = new
+
+        step = np.abs((new - best[idx])/STEPS).max(axis=1)
+        done = (improved & (step < tol)) | (best_error[idx] < 1e-6) | (damping[idx] > 1e6)
+        converged[idx] = done
+        active[idx] = ~done
+
+    return best, simulated, converged
+
+
+def fit_shots(df, P=101325, T=293, **kwargs):
+    """
+    Estimates the backspin, and the ball speed where it is missing, of every
+    shot in a shots DataFrame by fitting simulated flights to the measured
+    carry_distance, height and hang_time. Shots without launch_angle or
+    any measured target are left as nan.
+
+    Every club is first fitted on its median shot, and that solution is the
+    starting point for all shots of the club.
+
+    kwargs: Passed on to fit
+
+    Returns a DataFrame with the same index as df and the columns
+    ball_speed, backspin, carry, height, hang_time (simulated) and converged.
+    """
+    measured_cols = [col for col, _, _ in TARGETS]
+    data = df.reindex(columns=['club', 'ball_speed', 'launch_angle'] + measured_cols)
+    data = data.astype({col: float for col in ['ball_speed', 'launch_angle'] + measured_cols})
+
+    # Fit the median shot of every club as warm start
+    clubs = data.groupby('club', observed=True)[['ball_speed', 'launch_angle'] + measured_cols].median()
+    clubs = clubs.loc[[club for club in clubs.index if club in CLUB_DEFAULTS]]
+    default_speed = np.array([CLUB_DEFAULTS[club][0] for club in clubs.index], dtype=float)
+    default_spin = np.array([CLUB_DEFAULTS[club][1] for club in clubs.index], dtype=float)
+    known = clubs.ball_speed.notna().to_numpy()
+    params, _, _ = fit(
+        np.where(known, clubs.ball_speed, default_speed),
+        clubs.launch_angle.to_numpy(),
+        default_spin,
+        clubs[measured_cols].to_numpy(),
+        known,
+        P, T, **kwargs)
+    start = pd.DataFrame(params, index=clubs.index, columns=['ball_speed', 'backspin'])
+    start = start.reindex(data.club)
+
+    known = data.ball_speed.notna().to_numpy()
+    params, simulated, converged = fit(
+        np.where(known, data.ball_speed, start.ball_speed),
+        data.launch_angle.to_numpy(),
+        start.backspin.to_numpy(),
+        data[measured_cols].to_numpy(),
+        known,
+        P, T, **kwargs)
+
+    result = pd.DataFrame(params, index=df.index, columns=['ball_speed', 'backspin'])
+    for i, (_, sim, _) in enumerate(TARGETS):
+        result[sim] = simulated[:, i]
+    result['converged'] = converged
+    result.loc[data.launch_angle.isna(), ['ball_speed', 'backspin']] = np.nan
+    return result
@@ -0,0 +1,63 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from aerodynamics import integrator
+
+
+def _simulate_chunk(args):
+    v0, spin, P, T, RH, kwargs = args
+    return integrator.simulate_batch(v0, spin, P, T, RH=RH, **kwargs)
+
+
+def chunks(n, chunksize):
+    """
+    Returns slices that split n items into chunks of at most chunksize
+    """
+    return [slice(i, min(i + chunksize, n)) for i in range(0, n, chunksize)]
+
+
+def simulate_many(v0, spin, P, T, workers=None, chunksize=500, **kwargs):
+    """
+    Simulates a large set of shots split over a process pool. Every chunk
+    is integrated with integrator.simulate_batch and the results are
+    returned in the same order as the input.
+
+    v0: (array) Initial velocities, shape (N, 3) [m/s]
+    spin: (array) Revolutions per second, shape (N, 3) [1/sec]
+    P: (int, array) Air pressure, scalar or shape (N,) [Pa]
+    T: (int, array) Air temperature, scalar or shape (N,) [K]
+    workers: (int) Number of processes, defaults to the number of CPUs.
+        With workers=1 everything runs in this process.
+    chunksize: (int) Number of shots per task
+    kwargs: Passed on to integrator.simulate_batch, RH can be per shot
+        (history and atmosphere not supported)
+
+    Returns the summary DataFrame of simulate_batch with one row per shot.
+    """
+    if kwargs.get('history') or kwargs.get('atmosphere') is not None:
+        raise Exception("history and atmosphere are not supported by simulate_many")
+
+    v0 = np.asarray(v0, dtype=float)
+    spin = np.asarray(spin, dtype=float)
+    n_shots = len(v0)
+    P = np.broadcast_to(np.asarray(P, dtype=float), (n_shots,))
+    T = np.broadcast_to(np.asarray(T, dtype=float), (n_shots,))
+    RH = np.broadcast_to(np.asarray(kwargs.pop('RH', 0), dtype=float), (n_shots,))
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    tasks = [(v0[s], spin[s], P[s], T[s], RH[s], kwargs) for s in chunks(n_shots, chunksize)]
+    if not tasks:
+        return integrator.simulate_batch(v0, spin, P, T, RH=RH, **kwargs)
+
+    if workers == 1 or len(tasks) == 1:
+        results = [_simulate_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            results = list(executor.map(_simulate_chunk, tasks))
+
+    return pd.concat(results, ignore_index=True)
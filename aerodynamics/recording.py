@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+# Quantities that can be fetched from ballflight.run and their widths
+QUANTITIES = {
+    'spin': 3,
+    'Re': 1,
+    'Cd': 1,
+    'F_drag': 3,
+    'F_lift': 3,
+}
+
+
+class Recorder:
+    """
+    Records per-step quantities into preallocated columnar arrays.
+    Row 0 belongs to the initial state and is left as nan, so the rows line
+    up with the positions of the trajectory.
+
+    fetch: (list) Names of the quantities to record, see QUANTITIES
+    size: (int) Initial number of rows, the arrays double when full
+    """
+
+    def __init__(self, fetch, size=128):
+        unknown = [name for name in fetch if name not in QUANTITIES]
+        if unknown:
+            raise Exception(f"Can't fetch {unknown}, must be one of {list(QUANTITIES)}")
+
+        self.columns = {name: np.full((size, QUANTITIES[name]), np.nan) for name in fetch}
+        self.n = 1
+
+    def record(self, **values):
+        """
+        Writes one row. Quantities that were not fetched are ignored.
+        """
+        if self.n == self.size:
+            self._grow()
+        for name, column in self.columns.items():
+            column[self.n] = values[name]
+        self.n += 1
+
+    @property
+    def size(self):
+        if not self.columns:
+            return np.inf
+        return len(next(iter(self.columns.values())))
+
+    def _grow(self):
+        for name, column in self.columns.items():
+            new = np.full((2*len(column), column.shape[1]), np.nan)
+            new[:len(column)] = column
+            self.columns[name] = new
+
+    def arrays(self):
+        """
+        Returns the recorded quantities as a dict of arrays, with shape
+        (n,) for scalars and (n, 3) for vectors.
+        """
+        return {
+            name: column[:self.n, 0] if column.shape[1] == 1 else column[:self.n]
+            for name, column in self.columns.items()
+        }
+
+    def to_frame(self):
+        """
+        Returns the recorded quantities as a DataFrame, with vectors
+        stored as one array per row.
+        """
+        return pd.DataFrame({
+            name: list(values) if values.ndim == 2 else values
+            for name, values in self.arrays().items()
+        })
@@ -0,0 +1,218 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Same column order as groupby().describe() in pandas 2.0
+STATS = ['count', 'mean', 'min', '25%', '50%', '75%', 'max', 'std']
+
+# Number of DataFrames that aggregates are kept for
+CACHE_SIZE = 8
+
+_cache = OrderedDict()
+
+
+class ClubAggregates:
+    """
+    Per-club aggregates of a shots DataFrame, computed with a single pass
+    over the club column and then cached per club and column.
+
+    Replaces df.groupby('club') in the dashboard, see get(). If stats is
+    given (a streaming.StatsSnapshot of the same shots, or a
+    storage.BackendStats of the same query), the describe tables of its
+    columns are read from it instead.
+    """
+
+    def __init__(self, df, version=None, stats=None):
+        self.df = df
+        self.version = version
+        self.stats = stats
+
+        codes, uniques = pd.factorize(df['club'], sort=False)
+        order = np.argsort(codes, kind='stable')
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        starts = np.concatenate([[0], np.cumsum(counts)]) + np.sum(codes < 0)
+
+        # Clubs in order of first appearance, like df.club.unique()
+        self.clubs = list(uniques)
+        self.index = {
+            club: order[starts[i]:starts[i+1]]
+            for i, club in enumerate(self.clubs)
+        }
+        self.sizes = pd.Series(counts, index=self.clubs)
+
+        self._describe = {}
+        self._groups = {}
+        self._cov = {}
+        self._clubs_with = {}
+        self._pairs = {}
+        self._present = {}
+
+    def __contains__(self, club):
+        return club in self.index
+
+    def group(self, club):
+        """
+        Same as df.groupby('club').get_group(club)
+        """
+        if club not in self._groups:
+            self._groups[club] = self.df.iloc[self.index[club]]
+        return self._groups[club]
+
+    def values(self, club, column, dropna=False):
+        """
+        Returns the values of a column for one club, in row order.
+        Numbers are returned as float64 with nan for missing values,
+        whatever dtype the column is stored in.
+        """
+        return self._take(column, self.index[club], dropna)
+
+    def _take(self, column, rows, dropna=False):
+        array = self.df[column].array.take(rows)
+        if pd.api.types.is_numeric_dtype(array.dtype) and not pd.api.types.is_bool_dtype(array.dtype):
+            values = array.to_numpy(dtype=float, na_value=np.nan)
+        else:
+            values = array.to_numpy()
+        if dropna:
+            values = values[~pd.isna(values)]
+        return values
+
+    def present(self, club, column):
+        """
+        Returns (ids, values) of the rows of club with a value in column
+        """
+        key = (club, column)
+        if key not in self._present:
+            values = self.values(club, column)
+            present = ~pd.isna(values)
+            ids = self.df.index.to_numpy()[self.index[club]][present]
+            self._present[key] = (ids, values[present])
+        return self._present[key]
+
+    def series(self, club, column):
+        return self.group(club)[column]
+
+    def counts(self, column):
+        """
+        Same as df.groupby('club').count()[column]
+        """
+        return self.describe(column)['count']
+
+    def describe(self, column):
+        """
+        Same as df.groupby('club').describe()[column]
+        """
+        if column not in self._describe and self.stats is not None and column in self.stats.columns:
+            self._describe[column] = self.stats.describe(column)
+        if column not in self._describe:
+            rows = []
+            for club in sorted(self.clubs):
+                x = self.values(club, column, dropna=True).astype(float)
+                if len(x):
+                    q = np.percentile(x, [0, 25, 50, 75, 100])
+                    std = x.std(ddof=1) if len(x) > 1 else np.nan
+                    rows.append([len(x), x.mean(), q[0], q[1], q[2], q[3], q[4], std])
+                else:
+                    rows.append([0] + [np.nan]*7)
+            table = pd.DataFrame(rows, columns=STATS, index=pd.Index(sorted(self.clubs), name='club'))
+            self._describe[column] = table
+        return self._describe[column]
+
+    def clubs_with(self, column):
+        """
+        Same as df.loc[~df[column].isna(), 'club'].unique(), as a list
+        """
+        if column not in self._clubs_with:
+            missing = pd.isna(self.df[column]).to_numpy()
+            first = {}
+            for club in self.clubs:
+                present = np.flatnonzero(~missing[self.index[club]])
+                if len(present):
+                    first[club] = self.index[club][present[0]]
+            self._clubs_with[column] = sorted(first, key=first.get)
+        return self._clubs_with[column]
+
+    def pairs(self, club, columns=('total_distance', 'side'), nvals=None):
+        """
+        Returns an (n, 2) array of the rows of club where both columns are
+        present, only the last nvals of them if nvals is an int
+        """
+        windowed = isinstance(nvals, int) and nvals > 0
+        key = (club, tuple(columns), nvals if windowed else None)
+        if key not in self._pairs:
+            # For a window only the last rows are read, more if they have
+            # missing values
+            index = self.index[club]
+            m = 2*nvals if windowed else len(index)
+            while True:
+                xy = np.column_stack([self._take(column, index[-m:]) for column in columns]).reshape(-1, 2)
+                xy = xy[~np.isnan(xy).any(axis=1)]
+                if not windowed or len(xy) >= nvals or m >= len(index):
+                    break
+                m *= 4
+            self._pairs[key] = xy[-nvals:] if windowed else xy
+        return self._pairs[key]
+
+    def window_cov(self, clubs, nvals=None, columns=('total_distance', 'side')):
+        """
+        Means and covariance matrices of the pairs() of several clubs at once.
+        Read from the stats when they keep that window, e.g. for the whole
+        shot store.
+
+        Returns (counts, means, covs) as arrays of shape (k,), (k, 2) and
+        (k, 2, 2) in the order of clubs, nan for clubs with too few shots.
+        """
+        k = len(clubs)
+        covariance = getattr(self.stats, 'covariance', None)
+        if covariance is not None and (columns, nvals) in covariance:
+            covs = [covariance.get(club, nvals) for club in clubs]
+            counts = np.array([cov.count if cov else 0 for cov in covs])
+            means = np.array([cov.mean if cov else [np.nan]*2 for cov in covs]).reshape(k, 2)
+            covs = np.array([cov.cov if cov else np.full((2, 2), np.nan) for cov in covs]).reshape(k, 2, 2)
+            return counts, means, covs
+
+        # All pairs in one array, with the position of their club as label
+        pairs = [self.pairs(club, columns, nvals) for club in clubs]
+        counts = np.array([len(xy) for xy in pairs])
+        labels = np.repeat(np.arange(k), counts)
+        xy = np.concatenate(pairs) if k else np.empty((0, 2))
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.column_stack([np.bincount(labels, xy[:, i], minlength=k) for i in range(2)]) / counts[:, None]
+            d = xy - means[labels]
+            m2 = np.array([
+                [np.bincount(labels, d[:, i]*d[:, j], minlength=k) for j in range(2)]
+                for i in range(2)
+            ]).transpose(2, 0, 1).reshape(k, 2, 2)
+            covs = np.where((counts > 1)[:, None, None], m2 / (counts - 1)[:, None, None], np.nan)
+        return counts, means, covs
+
+    def cov(self, club, columns=('total_distance', 'side')):
+        """
+        Covariance of columns over the rows of club where all are present
+        """
+        key = (club, tuple(columns))
+        if key not in self._cov:
+            self._cov[key] = self.group(club)[list(columns)].dropna().cov()
+        return self._cov[key]
+
+
+def get(df, version=None, stats=None):
+    """
+    Returns the ClubAggregates of df. They are built once per DataFrame
+    object, so they are reused until the shot store hands out a new frame.
+    version and stats are only used when the aggregates are built.
+    """
+    key = id(df)
+    if key in _cache and _cache[key].df is df:
+        _cache.move_to_end(key)
+        return _cache[key]
+
+    _cache[key] = ClubAggregates(df, version, stats)
+    while len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return _cache[key]
+
+
+def clear():
+    _cache.clear()
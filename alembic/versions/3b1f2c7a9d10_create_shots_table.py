@@ -0,0 +1,43 @@
+"""create shots table
+
+Existing databases that were created from models.py already have this
+table and should be stamped instead: alembic stamp 3b1f2c7a9d10
+
+Revision ID: 3b1f2c7a9d10
+Revises: 
+Create Date: 2026-10-18 19:02:11.482310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b1f2c7a9d10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'shots',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('club', sa.Enum('1W', '3W', '4', '5', '6', '7', '8', '9', 'P', '52', '56'), nullable=True),
+        sa.Column('total_distance', sa.Integer(), nullable=True),
+        sa.Column('carry_distance', sa.Integer(), nullable=True),
+        sa.Column('missed', sa.Boolean(), nullable=True),
+        sa.Column('date', sa.Date(), nullable=True),
+        sa.Column('ball_speed', sa.Integer(), nullable=True),
+        sa.Column('launch_angle', sa.Integer(), nullable=True),
+        sa.Column('height', sa.Integer(), nullable=True),
+        sa.Column('impact_angle', sa.Integer(), nullable=True),
+        sa.Column('hang_time', sa.Float(), nullable=True),
+        sa.Column('curve', sa.Integer(), nullable=True),
+        sa.Column('side', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade():
+    op.drop_table('shots')
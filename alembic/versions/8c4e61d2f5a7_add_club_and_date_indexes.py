@@ -0,0 +1,26 @@
+"""add club and date indexes
+
+Revision ID: 8c4e61d2f5a7
+Revises: 3b1f2c7a9d10
+Create Date: 2026-10-18 19:20:45.907114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4e61d2f5a7'
+down_revision = '3b1f2c7a9d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_shots_club_date_id', 'shots', ['club', 'date', 'id'], unique=False)
+    op.create_index('ix_shots_date', 'shots', ['date'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_shots_date', table_name='shots')
+    op.drop_index('ix_shots_club_date_id', table_name='shots')
@@ -0,0 +1,37 @@
+"""
+Compare simulate_batch with simulating the same shots one at a time.
+
+Run from the repository root:
+    python benchmarks/bench_batch.py
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+
+from aerodynamics import ballflight, integrator
+from bench_integrator import launch_conditions
+
+
+if __name__ == '__main__':
+    P, T = 101325, 294
+    for n in [10, 100, 1000]:
+        v0, spin = launch_conditions(n)
+
+        t1 = time.perf_counter()
+        carry_loop = []
+        for v, s in zip(v0, spin):
+            pos, _, _ = integrator.simulate(v, P, T, s, raw=True)
+            carry_loop.append(ballflight.carry(pos))
+        t_loop = time.perf_counter() - t1
+
+        t1 = time.perf_counter()
+        result = integrator.simulate_batch(v0, spin, P, T)
+        t_batch = time.perf_counter() - t1
+
+        diff = np.abs(result.carry.to_numpy() - np.array(carry_loop)).max()
+        print(f"N={n:5d}  loop: {t_loop:7.3f} s  batch: {t_batch:7.3f} s  "
+              f"speedup: {t_loop/t_batch:6.1f}x  max carry diff: {diff:.3f} m")
@@ -0,0 +1,54 @@
+"""
+Steps per shot and carry error of the integrators, measured against a
+very fine Euler reference with exact landing detection.
+
+Run from the repository root:
+    python benchmarks/bench_convergence.py
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+
+from aerodynamics import integrator
+from bench_integrator import launch_conditions
+
+
+def carries(v0, spin, **kwargs):
+    steps, carry = [], []
+    t1 = time.perf_counter()
+    for v, s in zip(v0, spin):
+        pos, _, _ = integrator.simulate(v, 101325, 294, s, raw=True, **kwargs)
+        steps.append(len(pos) - 1)
+        carry.append(pos[-1][1])
+    elapsed = time.perf_counter() - t1
+    return np.mean(steps), np.array(carry), 1000*elapsed/len(v0)
+
+
+if __name__ == '__main__':
+    v0, spin = launch_conditions(10)
+
+    _, reference, _ = carries(v0, spin, method='euler', dt=1e-4, landing=True)
+
+    configs = [
+        ('euler (as run)', dict(method='euler', dt=0.05, landing=False)),
+        ('euler', dict(method='euler', dt=0.05, landing=True)),
+        ('euler', dict(method='euler', dt=0.01, landing=True)),
+        ('euler', dict(method='euler', dt=0.001, landing=True)),
+        ('rk4', dict(method='rk4', dt=0.2)),
+        ('rk4', dict(method='rk4', dt=0.1)),
+        ('rk4', dict(method='rk4', dt=0.05)),
+        ('rk45', dict(method='rk45', rtol=1e-3, atol=1e-3)),
+        ('rk45', dict(method='rk45', rtol=1e-6, atol=1e-6)),
+        ('rk45', dict(method='rk45', rtol=1e-9, atol=1e-9)),
+    ]
+
+    print(f"{'method':16s} {'dt/tol':>8s} {'steps':>8s} {'ms/shot':>8s} {'max carry error (m)':>20s}")
+    for name, kwargs in configs:
+        steps, carry, ms = carries(v0, spin, **kwargs)
+        setting = kwargs.get('rtol', kwargs.get('dt'))
+        error = np.abs(carry - reference).max()
+        print(f"{name:16s} {setting:8.0e} {steps:8.1f} {ms:8.2f} {error:20.5f}")
@@ -0,0 +1,110 @@
+"""
+Memory and group-by time of the shots DataFrame with the default dtypes of
+pd.read_sql (object club, int64/float64 numbers, datetime64[ns] date)
+against the compact dtypes of the shot store (see shotstore.column_dtype),
+on a synthetic table.
+
+Run from the repository root:
+    python benchmarks/bench_dtypes.py [n_rows]
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+from models import Shots
+from shotstore import compact_frame, memory_report
+
+# Number of times every group-by is run, the best time is shown
+REPEAT = 3
+
+
+def shots_frame(n, seed=0):
+    """
+    Returns n random shots like pd.read_sql of the shots table: integer
+    columns with missing values are float64, the others int64
+    """
+    rng = np.random.default_rng(seed)
+    missing = rng.random(n) < 0.3
+    df = pd.DataFrame({
+        'id': np.arange(1, n + 1),
+        'club': rng.choice(Shots.enums, n).astype(object),
+        'total_distance': rng.integers(50, 250, n),
+        'carry_distance': rng.integers(40, 240, n),
+        'missed': rng.integers(0, 2, n).astype(bool),
+        'date': pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 1500, n), unit='D'),
+        'ball_speed': np.where(missing, np.nan, rng.integers(30, 75, n)),
+        'launch_angle': np.where(missing, np.nan, rng.integers(8, 30, n)),
+        'height': np.where(missing, np.nan, rng.integers(5, 35, n)),
+        'impact_angle': np.where(missing, np.nan, rng.integers(20, 55, n)),
+        'hang_time': np.where(missing, np.nan, rng.uniform(3, 8, n).round(1)),
+        'curve': np.where(missing, np.nan, rng.integers(-20, 20, n)),
+        'side': np.where(missing, np.nan, rng.integers(-30, 30, n)),
+    })
+    return df
+
+
+def same_values(default, compact):
+    """
+    True if the columns are equal, up to float32 precision for floats
+    """
+    for name in default.columns:
+        if pd.api.types.is_numeric_dtype(default[name]) and not pd.api.types.is_bool_dtype(default[name]):
+            a = default[name].to_numpy(dtype=float)
+            b = compact[name].to_numpy(dtype=float, na_value=np.nan)
+            if not np.allclose(a, b, rtol=1e-6, equal_nan=True):
+                return False
+        elif not (default[name].astype(object) == compact[name].astype(object)).all():
+            return False
+    return True
+
+
+def best_time(f, repeat=REPEAT):
+    times = []
+    for _ in range(repeat):
+        t1 = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - t1)
+    return min(times)
+
+
+def groupbys(df):
+    """
+    Returns {name: function} of the per-club aggregates of the dashboard
+    """
+    return {
+        'groupby describe': lambda: df.groupby('club', observed=True)['total_distance'].describe(),
+        'groupby mean/std/median': lambda: df.groupby('club', observed=True)[['total_distance', 'carry_distance']]
+            .agg(['mean', 'std', 'median']),
+        'ClubAggregates describe': lambda: aggregates.ClubAggregates(df).describe('total_distance'),
+    }
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    shots = shots_frame(n)
+    default = shots.set_index('id')
+
+    t1 = time.perf_counter()
+    compact = compact_frame(default)
+    convert = time.perf_counter() - t1
+
+    print(f"rows: {n}, compact_frame: {convert:.2f} s, same values: {same_values(default, compact)}")
+    print()
+
+    reports = {'default': memory_report(default), 'compact': memory_report(compact)}
+    print(pd.concat(reports, axis=1).round(2).to_string())
+    print()
+
+    times = {}
+    for name, df in [('default', default), ('compact', compact)]:
+        times[name] = {query: best_time(f) * 1e3 for query, f in groupbys(df).items()}
+    times = pd.DataFrame(times)
+    times['speedup'] = times['default'] / times['compact']
+    print(f"best of {REPEAT} runs [ms]")
+    print(times.round(1).to_string())
@@ -0,0 +1,96 @@
+"""
+Confidence regions of the Home page: the per-club get_ellipse loop it
+replaced (group per club, covariance on all rows, 50 np.dot rotations)
+against utils.get_ellipses on a plain DataFrame (batched covariances) and
+on the shot store frame (covariances kept up to date by the store), for
+every clubs and every window option.
+
+Run from the repository root:
+    python benchmarks/bench_ellipses.py [n_rows]
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+import utils
+from bench_dtypes import shots_frame
+from shotstore import ShotStore
+
+# Number of times every run is repeated, the best time is shown
+REPEAT = 5
+
+NVALS = [None, 100, 20]
+
+
+def loop_ellipse(df, club, nvals=None, xcol='total_distance', ycol='side', p=0.95):
+    """
+    The get_ellipse of before, with the orientation fix
+    """
+    dff = df.groupby('club').get_group(club)[['total_distance', 'side']].dropna()
+    nvals = min(nvals, len(dff)) if nvals else len(dff)
+    y = dff[ycol].to_numpy(dtype=float)[-nvals:]
+    x = dff[xcol].to_numpy(dtype=float)[-nvals:]
+    x_mean, y_mean = x.mean(), y.mean()
+
+    w, v = np.linalg.eigh(dff.cov().to_numpy())
+    s = -2*np.log(1-p)
+    t = np.linspace(0, 2*np.pi)
+    X = np.sqrt(w[1]*s)*np.cos(t)
+    Y = np.sqrt(w[0]*s)*np.sin(t)
+    theta = np.arctan(v[1, 1] / v[0, 1])
+    R = np.array([
+        [np.cos(theta), -np.sin(theta)],
+        [np.sin(theta), np.cos(theta)]
+    ])
+
+    X_rot, Y_rot = [], []
+    for X_, Y_ in zip(X, Y):
+        x_temp, y_temp = np.dot(R, np.array([X_, Y_]))
+        X_rot.append(x_temp+x_mean)
+        Y_rot.append(y_temp+y_mean)
+    return (X_rot, Y_rot, x, y)
+
+
+def best_time(f, repeat=REPEAT):
+    times = []
+    for _ in range(repeat):
+        t1 = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - t1)
+    return min(times)
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    shots = shots_frame(n)
+    plain = shots.set_index('id')
+    store = ShotStore()
+    store.append(shots)
+    clubs = list(plain.loc[~plain.side.isna(), 'club'].unique())
+
+    results = {}
+    for nvals in NVALS:
+        # New aggregates for every run, like a new frame after an upload
+        def batched(df, stats=None):
+            aggregates.clear()
+            aggregates.get(df, stats=stats)
+            return utils.get_ellipses(df, clubs, nvals=nvals)
+
+        results[f"nvals={nvals}"] = {
+            'get_ellipse loop': best_time(lambda: [loop_ellipse(plain, club, nvals) for club in clubs]),
+            'get_ellipses': best_time(lambda: batched(plain)),
+            'get_ellipses, store stats': best_time(lambda: batched(store.frame(), store.stats.snapshot())),
+        }
+
+    # Shots arriving one at a time
+    new = shots.iloc[-1:].assign(id=n + 1)
+    results['append one shot'] = {'store covariances': best_time(lambda: store.stats.covariance.update_frame(new))}
+
+    print(f"rows: {n}, clubs: {len(clubs)}, best of {REPEAT} runs [ms]")
+    print((pd.DataFrame(results) * 1e3).round(2).to_string())
@@ -0,0 +1,79 @@
+"""
+Import speed of csv uploads: the bulk path in ingest against adding one
+Shots object per row to the session, on an in-memory SQLite database.
+
+Run from the repository root:
+    python benchmarks/bench_ingest.py [n_rows]
+"""
+import io
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pandas as pd
+import sqlalchemy as db
+from sqlalchemy.orm import sessionmaker
+
+import ingest
+import storage
+from models import Base, Shots
+
+
+def shots_csv(n, seed=0):
+    """
+    Returns a csv file of n random shots with every column of the upload
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'club': rng.choice(Shots.enums, n),
+        'total_distance': rng.integers(50, 250, n),
+        'carry_distance': rng.integers(40, 240, n),
+        'missed': rng.integers(0, 2, n),
+        'date': pd.Timestamp('2022-01-01') + pd.to_timedelta(rng.integers(0, 365, n), unit='D'),
+        'ball_speed': rng.integers(30, 75, n),
+        'launch_angle': rng.integers(8, 30, n),
+        'height': rng.integers(5, 35, n),
+        'impact_angle': rng.integers(20, 55, n),
+        'hang_time': rng.uniform(3, 8, n).round(1),
+        'curve': rng.integers(-20, 20, n),
+        'side': rng.integers(-30, 30, n),
+    })
+    df['date'] = df['date'].dt.strftime('%Y-%m-%d')
+    return df.to_csv(index=False).encode('utf-8')
+
+
+def new_backend():
+    engine = db.create_engine('sqlite://', poolclass=db.pool.StaticPool)
+    Base.metadata.create_all(engine)
+    return storage.SQLBackend(engine)
+
+
+def orm_per_row(data, session):
+    df = pd.read_csv(io.BytesIO(data), dtype={'club': str})
+    for row in df.to_dict('records'):
+        row['date'] = pd.Timestamp(row['date']).date()
+        row['missed'] = bool(row['missed'])
+        session.add(Shots(**row))
+    session.commit()
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    data = shots_csv(n)
+    print(f"rows: {n}, file size: {len(data)/1e6:.2f} MB")
+
+    session = sessionmaker(bind=new_backend().engine)()
+    t1 = time.perf_counter()
+    orm_per_row(data, session)
+    elapsed = time.perf_counter() - t1
+    print(f"ORM, one object per row   {elapsed:6.3f} s  {n/elapsed:8.0f} rows/s")
+
+    for batch_size in [100, 1000, 10000]:
+        backend = new_backend()
+        df, errors, elapsed = ingest.ingest(data, backend, batch_size=batch_size)
+        saved = len(backend.shots_after(0))
+        print(f"bulk, batch size {batch_size:5d}    {elapsed:6.3f} s  {n/elapsed:8.0f} rows/s  "
+              f"saved: {saved}  errors: {len(errors)}")
@@ -0,0 +1,45 @@
+"""
+Compare the preallocated integrator with ballflight.run.
+
+Run from the repository root:
+    python benchmarks/bench_integrator.py
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+
+from aerodynamics import ballflight, integrator
+
+
+def launch_conditions(n, seed=0):
+    rng = np.random.default_rng(seed)
+    speed = rng.uniform(30, 70, n)
+    angle = rng.uniform(8, 25, n) * np.pi/180
+    backspin = rng.uniform(2000, 8000, n) / 60
+    v0 = speed[:, None] * np.column_stack([np.zeros(n), np.cos(angle), np.sin(angle)])
+    spin = np.column_stack([backspin, np.zeros(n), np.zeros(n)])
+    return v0, spin
+
+
+def timeit(func, v0, spin, P=101325, T=294):
+    t1 = time.perf_counter()
+    carries = [ballflight.carry(func(v, P, T, s)['position'].to_numpy()) for v, s in zip(v0, spin)]
+    return time.perf_counter() - t1, np.array(carries)
+
+
+if __name__ == '__main__':
+    n = 50
+    v0, spin = launch_conditions(n)
+
+    t_run, carry_run = timeit(ballflight.run, v0, spin)
+    t_sim, carry_sim = timeit(integrator.simulate, v0, spin)
+
+    print(f"shots: {n}")
+    print(f"ballflight.run:      {1000*t_run/n:.2f} ms/shot")
+    print(f"integrator.simulate: {1000*t_sim/n:.2f} ms/shot")
+    print(f"speedup: {t_run/t_sim:.1f}x")
+    print(f"max carry difference: {np.abs(carry_run-carry_sim).max():.3f} m")
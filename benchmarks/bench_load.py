@@ -0,0 +1,163 @@
+"""
+Load test of concurrent save and refresh requests. The app is served by a
+threaded werkzeug server on a SQLite stand-in database (or DATABASE_URL if
+set, e.g. a local MySQL, or the backend selected by STORAGE_BACKEND) and
+requests are sent to the Dash callback endpoint from a pool of client
+threads.
+
+To test a running deployment instead (e.g. gunicorn with several
+workers), pass its address with --url.
+
+Run from the repository root:
+    python benchmarks/bench_load.py [n_requests] [--url http://localhost:8050]
+"""
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+
+ENDPOINT = '/_dash-update-component'
+
+# Number of client threads of every run
+CONCURRENCY = [1, 4, 8, 16, 32]
+
+
+def save_payload(i):
+    """
+    Request of the single shot form on the Data page
+    """
+    states = {
+        'club_dropdown_id': '7',
+        'total_distance_input_id': 140 + i % 20,
+        'carry_distance_input_id': 130 + i % 20,
+        'missed_radio_id': 0,
+        'upload_form_date_id': '2023-06-20',
+        'ball_speed_input_id': None,
+        'launch_angle_input_id': None,
+        'height_input_id': None,
+        'impact_angle_input_id': None,
+        'hang_time_input_id': None,
+        'curve_input_id': None,
+        'side_input_id': None,
+    }
+    return {
+        'output': 'upload_form_response.children',
+        'outputs': {'id': 'upload_form_response', 'property': 'children'},
+        'inputs': [{'id': 'save_upload_form_btn', 'property': 'n_clicks', 'value': i + 1}],
+        'changedPropIds': ['save_upload_form_btn.n_clicks'],
+        'state': [{'id': key, 'property': 'date' if 'date' in key else 'value', 'value': value}
+                  for key, value in states.items()],
+    }
+
+
+def refresh_payload(i):
+    """
+    Request of the Refresh Data button
+    """
+    return {
+        'output': 'refresh_id.data',
+        'outputs': {'id': 'refresh_id', 'property': 'data'},
+        'inputs': [{'id': 'refresh_btn_id', 'property': 'n_clicks', 'value': i + 1}],
+        'changedPropIds': ['refresh_btn_id.n_clicks'],
+        'state': [],
+    }
+
+
+def post(url, payload):
+    request = urllib.request.Request(
+        url + ENDPOINT,
+        data=json.dumps(payload).encode(),
+        headers={'Content-Type': 'application/json'},
+    )
+    t1 = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        response.read()
+        status = response.status
+    return status, time.perf_counter() - t1
+
+
+def run(url, n, concurrency, save_fraction=0.5):
+    """
+    Sends n requests, a mix of saves and refreshes, with concurrency
+    client threads. Returns (requests/s, latencies, errors).
+    """
+    payloads = [save_payload(i) if i % int(1/save_fraction) == 0 else refresh_payload(i) for i in range(n)]
+
+    def send(payload):
+        try:
+            return post(url, payload)
+        except Exception:
+            return None, None
+
+    t1 = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(send, payloads))
+    elapsed = time.perf_counter() - t1
+
+    latencies = np.array([t for status, t in results if status == 200])
+    errors = sum(status != 200 for status, t in results)
+    return n / elapsed, latencies, errors
+
+
+def pool_status(backend):
+    engine = getattr(backend, 'engine', None)
+    return '-' if engine is None else engine.pool.status()
+
+
+def start_server():
+    """
+    Serves the app in a background thread. Returns its address.
+    """
+    if 'DATABASE_URL' not in os.environ:
+        path = Path(tempfile.mkdtemp()) / 'load.db'
+        os.environ['DATABASE_URL'] = f"sqlite:///{path}"
+        import sqlalchemy as db
+        from models import Base
+        Base.metadata.create_all(db.create_engine(os.environ['DATABASE_URL']))
+
+    from werkzeug.serving import make_server
+    import app
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    server = make_server('127.0.0.1', 0, app.server, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", app
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    url = None
+    if '--url' in args:
+        i = args.index('--url')
+        url = args[i+1]
+        del args[i:i+2]
+    n = int(args[0]) if args else 400
+
+    app = None
+    if url is None:
+        url, app = start_server()
+        print(f"storage: {app.backend}, pool: {pool_status(app.backend)}")
+        n_before = len(app.store)
+
+    print(f"requests per run: {n}, half saves and half refreshes")
+    for concurrency in CONCURRENCY:
+        rate, latencies, errors = run(url, n, concurrency)
+        p50, p95 = np.percentile(latencies, [50, 95]) * 1e3 if len(latencies) else (np.nan, np.nan)
+        print(f"clients: {concurrency:3d}  {rate:7.1f} req/s  "
+              f"p50: {p50:6.1f} ms  p95: {p95:6.1f} ms  errors: {errors}")
+
+    if app is not None:
+        app.update_df()
+        saves = len(CONCURRENCY) * len(range(0, n, 2))
+        print(f"shots saved: {len(app.store) - n_before} of {saves}, pool: {pool_status(app.backend)}")
@@ -0,0 +1,36 @@
+"""
+Scaling of parallel.simulate_many with the number of worker processes.
+
+Run from the repository root:
+    python benchmarks/bench_parallel.py [n_shots]
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+
+from aerodynamics import parallel
+from bench_integrator import launch_conditions
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    v0, spin = launch_conditions(n)
+    print(f"shots: {n}, cpus: {os.cpu_count()}")
+
+    reference = None
+    for workers in [1, 2, 4, 8]:
+        t1 = time.perf_counter()
+        result = parallel.simulate_many(v0, spin, 101325, 294, workers=workers, chunksize=2000, method='rk4')
+        elapsed = time.perf_counter() - t1
+
+        if reference is None:
+            reference = elapsed
+            expected = result
+        same = np.allclose(result.to_numpy(), expected.to_numpy())
+        print(f"workers: {workers}  {elapsed:7.2f} s  {n/elapsed:9.0f} shots/s  "
+              f"speedup: {reference/elapsed:4.1f}x  same result: {same}")
@@ -0,0 +1,83 @@
+"""
+Rolling statistics of the Heatmap and Error band cards on the Club details
+page while the window slider is dragged: pandas rolling over every club's
+history per slider move (as before) against rolling.get, the first time a
+window is seen and when it is seen again, and after new shots arrived.
+
+Run from the repository root:
+    python benchmarks/bench_rolling.py [n_rows]
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pandas as pd
+
+import aggregates
+import rolling
+from bench_dtypes import shots_frame
+from shotstore import ShotStore
+
+# Window sizes of a slider drag
+WINDOWS = list(range(5, 101, 5))
+
+# Club of the error band
+CLUB = '7'
+
+
+def pandas_move(df, window):
+    """
+    The statistics of one slider move with pandas rolling, like before
+    """
+    agg = aggregates.get(df)
+    for club in agg.clubs:
+        agg.series(club, 'total_distance').dropna().rolling(window).std()
+    roll = agg.series(CLUB, 'total_distance').dropna().rolling(window)
+    for q in (0.25, 0.5, 0.75):
+        roll.quantile(q)
+
+
+def engine_move(df, window):
+    for club in aggregates.get(df).clubs:
+        rolling.get(df, club, 'total_distance', window, 'stddev')
+    for q in (0.25, 0.5, 0.75):
+        rolling.get(df, CLUB, 'total_distance', window, q)
+
+
+def drag(move, df):
+    """
+    Returns the median time of a slider move over WINDOWS
+    """
+    times = []
+    for window in WINDOWS:
+        t1 = time.perf_counter()
+        move(df, window)
+        times.append(time.perf_counter() - t1)
+    return np.median(times)
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    shots = shots_frame(n + 10)
+    store = ShotStore()
+    store.append(shots.iloc[:n])
+    df = store.frame()
+
+    results = {
+        'pandas rolling': drag(pandas_move, df),
+        'rolling.get, new windows': drag(engine_move, df),
+        'rolling.get, cached windows': drag(engine_move, df),
+    }
+
+    # Ten new shots, then the same windows again
+    store.append(shots.iloc[n:])
+    df = store.frame()
+    results['rolling.get, after 10 new shots'] = drag(engine_move, df)
+    results['pandas rolling, after 10 new shots'] = drag(pandas_move, df)
+
+    print(f"rows: {n}, clubs: {len(aggregates.get(df).clubs)}, windows: {WINDOWS[0]}-{WINDOWS[-1]}")
+    print("median time per slider move [ms]")
+    print((pd.Series(results) * 1e3).round(2).to_string())
@@ -0,0 +1,75 @@
+"""
+Startup time of the shot store: reading the whole shots table against
+memory-mapping a snapshot and fetching only the shots saved after it, on a
+SQLite database with random shots.
+
+Run from the repository root:
+    python benchmarks/bench_snapshot.py [n_rows]
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import sqlalchemy as db
+
+import snapshot
+import storage
+from bench_dtypes import shots_frame
+from models import Base
+from shotstore import ShotStore
+
+# Shots saved after the snapshot in the last run
+DELTA = 1000
+
+
+def new_backend(path, n):
+    engine = db.create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    add_shots(engine, shots_frame(n).drop(columns='id'))
+    return storage.SQLBackend(engine)
+
+
+def add_shots(engine, df):
+    df = df.assign(date=df['date'].dt.date)
+    df.to_sql('shots', engine, if_exists='append', index=False, chunksize=10000)
+
+
+def timed(f):
+    t1 = time.perf_counter()
+    result = f()
+    return result, time.perf_counter() - t1
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    tmp = Path(tempfile.mkdtemp())
+    path = str(tmp / 'snapshot')
+    backend = new_backend(tmp / 'shots.db', n)
+    print(f"rows: {n}")
+
+    _, elapsed = timed(lambda: ShotStore().refresh(backend))
+    print(f"read whole table                 {elapsed*1e3:9.1f} ms")
+
+    store, elapsed = timed(lambda: snapshot.open_store(backend, path))
+    size = sum(f.stat().st_size for f in Path(path).rglob('*.npy'))
+    print(f"no snapshot: read and save       {elapsed*1e3:9.1f} ms  ({size/1e6:.1f} MB of npy files)")
+
+    mapped, elapsed = timed(lambda: snapshot.open_store(backend, path))
+    print(f"map snapshot, no new shots       {elapsed*1e3:9.1f} ms")
+
+    add_shots(backend.engine, shots_frame(DELTA, seed=1).drop(columns='id'))
+    mapped, elapsed = timed(lambda: snapshot.open_store(backend, path))
+    print(f"map snapshot, {DELTA} new shots    {elapsed*1e3:9.1f} ms")
+
+    frame, elapsed = timed(mapped.frame)
+    memmaps = sum(isinstance(array, np.memmap) for array in mapped.columns.values())
+    print(f"frame() of mapped store          {elapsed*1e3:9.1f} ms  ({memmaps} of {len(mapped.columns)} columns memory-mapped)")
+
+    reference = ShotStore()
+    reference.refresh(backend)
+    print(f"same frame as reading the table: {frame.equals(reference.frame())}")
@@ -0,0 +1,69 @@
+"""
+Reading a 50k row xlsx upload: spreadsheet.read_sheet, used by the upload
+pipeline, against pd.read_excel of the whole sheet. The workbook has an
+extra sheet and columns that are not uploaded, like launch monitor exports.
+
+Run from the repository root:
+    python benchmarks/bench_spreadsheet.py [n_rows]
+"""
+import io
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pandas as pd
+
+import ingest
+from bench_ingest import shots_csv, new_backend
+
+
+def shots_xlsx(n, seed=0):
+    """
+    Returns an xlsx file with n random shots on the second sheet
+    """
+    import openpyxl
+
+    df = pd.read_csv(io.BytesIO(shots_csv(n, seed)), dtype={'club': str})
+    df['date'] = pd.to_datetime(df['date'])
+    df['spin_axis'] = 0.0
+    df['smash_factor'] = 1.4
+    df['club_path'] = -1.5
+
+    workbook = openpyxl.Workbook(write_only=True)
+    summary = workbook.create_sheet('Summary')
+    summary.append(['session', 'shots'])
+    summary.append(['range', n])
+    sheet = workbook.create_sheet('Shots')
+    sheet.append(list(df.columns))
+    for row in df.itertuples(index=False):
+        sheet.append([i.to_pydatetime() if isinstance(i, pd.Timestamp) else i for i in row])
+
+    f = io.BytesIO()
+    workbook.save(f)
+    return f.getvalue()
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    data = shots_xlsx(n)
+    print(f"rows: {n}, file size: {len(data)/1e6:.2f} MB")
+
+    t1 = time.perf_counter()
+    df = pd.read_excel(io.BytesIO(data), sheet_name='Shots', dtype={'club': str})
+    elapsed = time.perf_counter() - t1
+    print(f"pd.read_excel                 {elapsed:6.2f} s  {n/elapsed:8.0f} rows/s")
+
+    t1 = time.perf_counter()
+    raw = ingest.read_spreadsheet(data)
+    elapsed = time.perf_counter() - t1
+    print(f"ingest.read_spreadsheet       {elapsed:6.2f} s  {n/elapsed:8.0f} rows/s")
+
+    converted = ingest.convert(raw)
+    same = (converted['total_distance'].to_numpy() == df['total_distance'].to_numpy()).all() \
+        and (converted['club'].to_numpy() == df['club'].to_numpy()).all()
+    print(f"same values: {same}")
+
+    shots, errors, elapsed = ingest.ingest(data, new_backend(), kind='xlsx')
+    print(f"full import (read, convert, insert)  {elapsed:6.2f} s  {n/elapsed:8.0f} rows/s  errors: {len(errors)}")
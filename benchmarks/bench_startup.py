@@ -0,0 +1,78 @@
+"""
+Startup of the app in a new process: time to import app.py, time of the
+first response (the index page and the page content callback of Home) and
+which heavy modules have been imported by then. Runs on a SQLite stand-in
+database with random shots.
+
+Run from the repository root:
+    python benchmarks/bench_startup.py [n_rows]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import sqlalchemy as db
+
+from bench_dtypes import shots_frame
+from models import Base
+
+# Fresh processes per measurement, the median is shown
+RUNS = 5
+
+HEAVY_MODULES = ['plotly.express', 'plotly.figure_factory', 'scipy', 'matplotlib']
+
+CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+client = app.server.test_client()
+client.get('/')
+client.post('/_dash-update-component', json={
+    'output': 'page-content.children',
+    'outputs': {'id': 'page-content', 'property': 'children'},
+    'inputs': [{'id': 'url', 'property': 'pathname', 'value': '/'}],
+    'changedPropIds': ['url.pathname'],
+    'state': [],
+})
+t2 = time.perf_counter()
+print(json.dumps({
+    'import': t1 - t0,
+    'first response': t2 - t1,
+    'modules': [m for m in %r if m in sys.modules],
+}))
+""" % HEAVY_MODULES
+
+
+def run_child(env):
+    out = subprocess.run([sys.executable, '-c', CHILD], env=env, capture_output=True, text=True,
+                         cwd=Path(__file__).resolve().parents[1], check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    tmp = Path(tempfile.mkdtemp())
+
+    url = f"sqlite:///{tmp / 'shots.db'}"
+    engine = db.create_engine(url)
+    Base.metadata.create_all(engine)
+    shots = shots_frame(n).drop(columns='id')
+    shots['club'] = shots['club'].where(shots['club'] != '56', '52')
+    shots.assign(date=shots['date'].dt.date).to_sql('shots', engine, if_exists='append', index=False)
+
+    env = dict(os.environ, DATABASE_URL=url, SNAPSHOT_PATH=str(tmp / 'snapshot'))
+    # The first run writes the snapshot
+    run_child(env)
+    runs = [run_child(env) for _ in range(RUNS)]
+
+    print(f"rows: {n}, median of {RUNS} runs")
+    for key in ['import', 'first response']:
+        print(f"{key:15s} {np.median([r[key] for r in runs])*1e3:8.1f} ms")
+    print(f"heavy modules imported: {', '.join(runs[-1]['modules']) or 'none'}")
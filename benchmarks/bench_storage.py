@@ -0,0 +1,99 @@
+"""
+Dashboard aggregate queries per storage backend: per-club describe tables
+(group-by with quantiles) and date range reads, on the same random shots
+saved in each backend.
+
+SQLite and DuckDB are always run, MySQL (or any other database) too if its
+url is given with --url.
+
+Run from the repository root:
+    python benchmarks/bench_storage.py [n_rows] [--url mysql+pymysql://user:pw@host/db]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pandas as pd
+
+import database
+import ingest
+import storage
+from bench_ingest import shots_csv
+from models import Base
+
+# Number of times every query is run, the best time is shown
+REPEAT = 5
+
+RANGE = ('2022-03-01', '2022-05-31')
+
+
+def best_time(f, repeat=REPEAT):
+    times = []
+    for _ in range(repeat):
+        t1 = time.perf_counter()
+        f()
+        times.append(time.perf_counter() - t1)
+    return min(times)
+
+
+def sql_backend(uri):
+    engine = database.create_engine(uri)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    return storage.SQLBackend(engine)
+
+
+def queries(backend):
+    """
+    Returns {name: query} of the aggregates behind the Home and Club details pages
+    """
+    return {
+        'describe total': lambda: backend.describe('total_distance'),
+        'describe carry, date range': lambda: backend.describe('carry_distance', start=RANGE[0], end=RANGE[1]),
+        'read date range': lambda: backend.read_shots(start=RANGE[0], end=RANGE[1],
+                                                      columns=['club', 'date', 'total_distance']),
+        'read all': lambda: backend.shots_after(0),
+    }
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    urls = {}
+    if '--url' in args:
+        i = args.index('--url')
+        urls['mysql'] = args[i+1]
+        del args[i:i+2]
+    n = int(args[0]) if args else 100000
+
+    data = shots_csv(n)
+    tmp = Path(tempfile.mkdtemp())
+    backends = {
+        'sqlite': lambda: sql_backend(f"sqlite:///{tmp / 'shots.db'}"),
+        'duckdb': lambda: storage.DuckDBBackend(str(tmp / 'parquet')),
+    }
+    backends.update({name: (lambda url=url: sql_backend(url)) for name, url in urls.items()})
+
+    print(f"rows: {n}, best of {REPEAT} runs")
+    results = {}
+    reference = None
+    for name, new_backend in backends.items():
+        backend = new_backend()
+        df, errors, seconds = ingest.ingest(data, backend, batch_size=10000)
+        results[name] = {'import': seconds}
+        for query, f in queries(backend).items():
+            results[name][query] = best_time(f)
+
+        # Both backends should give the same numbers
+        table = backend.describe('total_distance')
+        if reference is None:
+            reference = table
+        else:
+            same = np.allclose(table.to_numpy(float), reference.to_numpy(float), equal_nan=True)
+            print(f"{name} describe same as {list(backends)[0]}: {same}")
+
+    results = pd.DataFrame(results) * 1e3
+    print(results.round(1).to_string(float_format=lambda x: f"{x:8.1f} ms"))
@@ -1,16 +1,25 @@
 # from golf_dashboard.utils import small_rainbow
 import numpy as np
 import pandas as pd
-import plotly.express as px
-import plotly.figure_factory as ff
 import plotly.graph_objects as go
-from plotly.colors import n_colors
+from plotly.colors import n_colors, qualitative
+import aggregates
+import rolling
 import utils
 
+def get_empty_fig(text="No shots between the selected dates"):
+    fig = go.Figure()
+    fig.add_annotation(text=text, showarrow=False, font=dict(size=16, color='#666'))
+    fig.update_xaxes(visible=False)
+    fig.update_yaxes(visible=False)
+    fig.update_layout(height=300, plot_bgcolor='rgba(0,0,0,0)')
+    return fig
+
+
 def plot_conf_ellipse(df, show=[], clubs=None, nvals=None, xcol='total_distance', ycol='side'):
 
     if clubs is None:
-        clubs = df.loc[~df.side.isna(), 'club'].unique()
+        clubs = aggregates.get(df).clubs_with('side')
 
     # Axis limits
     xmax = df[xcol].max() + 20
@@ -22,10 +31,11 @@ def plot_conf_ellipse(df, show=[], clubs=None, nvals=None, xcol='total_distance'
 
     # Plot ellipses
     colors = utils.small_rainbow(df, clubs)
-    colors = px.colors.qualitative.G10
+    colors = qualitative.G10
     fig = go.Figure()
+    ellipses = utils.get_ellipses(df, clubs, nvals=nvals, xcol=xcol, ycol=ycol)
     for i, club in enumerate(clubs):
-        X, Y, x, y = utils.get_ellipse(df, club, nvals=nvals, xcol=xcol, ycol=ycol)
+        X, Y, x, y = ellipses[club]
         name = utils.club_enum[club]
         fig.add_trace(
             go.Scatter(
@@ -79,13 +89,19 @@ def plot_conf_ellipse(df, show=[], clubs=None, nvals=None, xcol='total_distance'
     return fig
 
 def my_dist_plot(df, range, distance='total', show_hist=False):
+    # figure_factory imports scipy, which takes most of the app's import time
+    import plotly.figure_factory as ff
 
     d = 'total_distance' if distance=='total' else 'carry_distance'
 
-    clubs = df.club.unique()
-    groups = df.groupby('club')
+    agg = aggregates.get(df)
 
-    hist_data = [groups.get_group(club)[d].dropna().values for club in clubs]
+    # The density estimate needs at least two different distances per club
+    clubs = [club for club in agg.clubs if len(np.unique(agg.values(club, d, dropna=True))) > 1]
+    if not clubs:
+        return get_empty_fig("Too few shots between the selected dates")
+
+    hist_data = [agg.values(club, d, dropna=True) for club in clubs]
     group_labels = [utils.club_enum[club] for club in clubs]
 
     fig = ff.create_distplot(hist_data, group_labels, show_hist=show_hist, show_rug=False)
@@ -111,10 +127,11 @@ def my_dist_plot(df, range, distance='total', show_hist=False):
 
 def get_boxplot_fig(df, distance='total_distance', axis='yaxis', nvals='all'):
 
-    colors = utils.big_rainbow(len(df.club.unique()))
+    agg = aggregates.get(df)
+    colors = utils.big_rainbow(len(agg.clubs))
 
     # Get an ordered list of clubs, excluding clubs with no data
-    clubs = [club for club in utils.club_enum.keys() if club in df.club.unique()]
+    clubs = [club for club in utils.club_enum.keys() if club in agg]
     clubs.reverse()
 
     xmin = df.carry_distance.min() - 10
@@ -124,7 +141,7 @@ def get_boxplot_fig(df, distance='total_distance', axis='yaxis', nvals='all'):
 
     fig = go.Figure()
     for club, color in zip(clubs, colors):
-        values = df.groupby('club').get_group(club)[distance].values
+        values = agg.values(club, distance)
         values = utils.get_values(values, nvals)
         name = utils.club_enum[club]
         if axis == 'yaxis':
@@ -158,11 +175,12 @@ def get_boxplot_fig(df, distance='total_distance', axis='yaxis', nvals='all'):
 def get_ridgeplot_fig(df, distance='total_distance', nvals='all'):
 
     clubs, xmin, xmax = utils.get_clubs(df)
+    agg = aggregates.get(df)
     colors = n_colors('rgb(242, 139, 0)', 'rgb(206, 0, 0)', 12, colortype='rgb')
     fig = go.Figure()
     for club, color in zip(clubs, colors):
         name = utils.club_enum[club]
-        array = df.groupby('club').get_group(club)[distance].values
+        array = agg.values(club, distance)
         data = utils.get_values(array, nvals)
         fig.add_trace(go.Violin(x=data, name=name, line_color=color))
 
@@ -189,21 +207,16 @@ def get_ridgeplot_fig(df, distance='total_distance', nvals='all'):
     return fig
 
 def get_heatplot_fig(df, stat, window_size):
-    clubs = [club for club in utils.club_enum if club in df.club.unique()]
+    agg = aggregates.get(df)
+    clubs = [club for club in utils.club_enum if club in agg]
 
-    # Create df with rolling stddev
-    dff = df.groupby('club')
+    if stat not in ('stddev', 'mean'):
+        stat = 'median'
 
     z = []
     for club in clubs:
-        # Get values for each club and replace nan with None
-        vals = dff.get_group(club).total_distance.dropna().rolling(window_size)
-        if stat == 'stddev':
-            vals = vals.std().to_list()
-        elif stat == 'mean':
-            vals = vals.mean().to_list()
-        else:
-            vals = vals.median().to_list()
+        # Rolling statistic for each club, cached per window
+        vals = rolling.get(df, club, 'total_distance', window_size, stat).tolist()
 
         z.append(vals)
 
@@ -245,18 +258,15 @@ def get_heatplot_fig(df, stat, window_size):
 
 def get_errorband_fig(df, club, column, window_size):
     
-    roll = df.groupby('club').get_group(club)[column].dropna().rolling(window_size)
-    quant25 = roll.quantile(0.25)
-    quant50 = roll.quantile(0.5)
-    quant75 = roll.quantile(0.75)
+    quant25 = rolling.get(df, club, column, window_size, 0.25)
+    quant50 = rolling.get(df, club, column, window_size, 0.5)
+    quant75 = rolling.get(df, club, column, window_size, 0.75)
     n_shots = len(quant50)
 
     ymax = df['total_distance'].max()
     ymin = df['carry_distance'].min()
     # range = [ymin-10, ymax+10]
 
-    dates = df.groupby('club').get_group(club).loc[window_size+1:, 'date']
-
     fig = go.Figure([
         go.Scatter(
             name="Median",
@@ -0,0 +1,25 @@
+# Serve with: gunicorn -c gunicorn.conf.py app:server
+# The database pool is configured with the DB_* variables, see database.py
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:8050')
+workers = int(os.environ.get('WEB_CONCURRENCY', min(4, 2*multiprocessing.cpu_count() + 1)))
+threads = int(os.environ.get('WEB_THREADS', 4))
+timeout = 120
+
+
+def on_starting(server):
+    # Write the snapshot of the shots once in the master process, so the
+    # workers start by mapping it instead of all reading the whole table
+    import snapshot
+    import storage
+    snapshot.open_store(storage.create_backend())
+
+
+def post_fork(server, worker):
+    # With preload_app the engine is created before forking, and pooled
+    # connections must not be shared between processes
+    import database
+    if database.engine is not None:
+        database.engine.dispose()
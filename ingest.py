@@ -0,0 +1,287 @@
+import base64
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+import spreadsheet
+from models import Shots
+
+REQUIRED_COLUMNS = ['club', 'total_distance', 'carry_distance', 'date']
+
+# Type of every column that can be uploaded
+INT_COLUMNS = ['total_distance', 'carry_distance', 'ball_speed', 'launch_angle',
+               'height', 'impact_angle', 'curve', 'side']
+FLOAT_COLUMNS = ['hang_time']
+COLUMNS = ['club', 'missed', 'date'] + INT_COLUMNS + FLOAT_COLUMNS
+
+# Range of the Integer columns of the shots table, and of the shot store
+INT_MIN, INT_MAX = -2**31, 2**31 - 1
+
+# Number of rows per INSERT statement
+BATCH_SIZE = 1000
+
+# Streaming imports: base64 characters decoded at a time (a multiple of 4)
+# and csv rows parsed at a time
+CHUNK_SIZE = 4 * 2**16
+CHUNK_ROWS = 5000
+
+# Every column is read as text and converted by convert()
+READ_KWARGS = {'dtype': str, 'keep_default_na': False, 'skipinitialspace': True}
+
+
+def read_shots(data):
+    """
+    Parses a csv file of shots in one pass.
+
+    data: (bytes, str) Content of the csv file
+
+    Returns a DataFrame with the columns of the file, in the order of the
+    file, and the text of every column before conversion (used to report
+    invalid values).
+    """
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    raw = pd.read_csv(io.StringIO(data), **READ_KWARGS)
+    return _strip(raw)
+
+
+def _strip(raw):
+    raw.columns = raw.columns.str.strip()
+    return raw.apply(lambda column: column.str.strip())
+
+
+def read_spreadsheet(data, kind='xlsx'):
+    """
+    Reads the shots of an Excel or ODS file like read_shots, from the first
+    sheet with the required columns and only the columns that can be saved.
+
+    data: (bytes) Content of the file
+    kind: (str) File type, see spreadsheet.file_type
+    """
+    raw = spreadsheet.read_sheet(io.BytesIO(data), columns=COLUMNS,
+                                 required=REQUIRED_COLUMNS, kind=kind)
+    if 'club' in raw.columns:
+        # Iron numbers are stored as numbers in spreadsheets
+        raw['club'] = raw['club'].map(_club_name)
+    return raw.where(raw.notna(), '')
+
+
+def _club_name(club):
+    if isinstance(club, float) and club.is_integer():
+        club = int(club)
+    return None if club is None else str(club).strip()
+
+
+def convert(raw):
+    """
+    Converts the text columns of read_shots to the types of the shots table.
+    Empty cells become missing values and so do cells that cannot be
+    converted, see validate().
+    """
+    df = pd.DataFrame(index=raw.index)
+    for name in raw.columns:
+        text = raw[name].replace('', None)
+        if name == 'club':
+            df[name] = text
+        elif name == 'date':
+            df[name] = pd.to_datetime(text, format='%Y-%m-%d', errors='coerce')
+        elif name == 'missed':
+            df[name] = pd.to_numeric(text, errors='coerce').astype('Float64').astype('boolean')
+        elif name in INT_COLUMNS:
+            values = pd.to_numeric(text, errors='coerce').astype('Float64')
+            df[name] = np.trunc(values).astype('Int64')
+        elif name in FLOAT_COLUMNS:
+            df[name] = pd.to_numeric(text, errors='coerce').astype('Float64')
+    return df
+
+
+def validate(raw, df):
+    """
+    Returns a list of error messages, empty if the shots can be saved
+    """
+    missing = [c for c in REQUIRED_COLUMNS if c not in raw.columns]
+    if missing:
+        return [f"Missing columns: {', '.join(missing)}"]
+
+    errors = []
+    clubs = df['club'].dropna()
+    bad_clubs = clubs[~clubs.isin(Shots.enums)].unique()
+    if len(bad_clubs) or df['club'].isna().any():
+        errors.append(f"Unknown clubs: {', '.join(map(str, bad_clubs)) or 'empty'}")
+
+    # Cells that had text but could not be converted
+    for name in df.columns:
+        if name == 'club':
+            continue
+        bad = df[name].isna() & (raw[name] != '')
+        if name == 'date':
+            bad |= raw[name] == ''
+        if bad.any():
+            rows = (bad[bad].index[:5] + 2).astype(str)
+            errors.append(f"Invalid {name} on line {', '.join(rows)}")
+
+        if name in INT_COLUMNS:
+            outside = ~df[name].between(INT_MIN, INT_MAX).fillna(True).astype(bool)
+            if outside.any():
+                rows = (outside[outside].index[:5] + 2).astype(str)
+                errors.append(f"Out of range {name} on line {', '.join(rows)}")
+    return errors
+
+
+def in_range(value):
+    """
+    True if an integer value fits in the integer columns of the shots table
+    """
+    return value is None or INT_MIN <= value <= INT_MAX
+
+
+def to_records(df):
+    """
+    Returns the rows of a converted DataFrame as dicts of python values
+    """
+    columns = {}
+    for name in df.columns:
+        if name == 'date':
+            columns[name] = df[name].dt.date.to_numpy(dtype=object)
+        else:
+            columns[name] = df[name].to_numpy(dtype=object, na_value=None)
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+
+def insert_batches(df, write, batch_size=BATCH_SIZE):
+    """
+    Writes the shots of a converted DataFrame batch_size rows at a time.
+    Returns the number of written rows.
+
+    write: (callable) Takes a list of records, see storage backends' writer()
+    """
+    records = to_records(df)
+    for i in range(0, len(records), batch_size):
+        write(records[i:i+batch_size])
+    return len(records)
+
+
+def insert_shots(df, backend, batch_size=BATCH_SIZE):
+    """
+    Saves the shots of a converted DataFrame in one transaction.
+    Returns the number of inserted rows.
+
+    backend: Storage backend, see storage.create_backend
+    """
+    with backend.writer() as write:
+        return insert_batches(df, write, batch_size)
+
+
+def ingest(data, backend, batch_size=BATCH_SIZE, kind='csv'):
+    """
+    Parses, validates and saves a csv or spreadsheet file of shots.
+
+    kind: (str) File type, 'csv' or one of spreadsheet.EXCEL_TYPES/ODS_TYPES
+
+    Returns (df, errors, seconds) where df is the converted DataFrame.
+    Nothing is saved if there are errors.
+    """
+    t1 = time.perf_counter()
+    raw = read_shots(data) if kind == 'csv' else read_spreadsheet(data, kind)
+    df = convert(raw)
+    errors = validate(raw, df)
+    if not errors:
+        insert_shots(df, backend, batch_size)
+    return df, errors, time.perf_counter() - t1
+
+
+class InvalidShots(Exception):
+    """
+    Raised inside a writer to roll back a streaming import with errors
+    """
+
+    def __init__(self, errors):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+
+class IterStream(io.RawIOBase):
+    """
+    Read-only file object over an iterator of bytes, so pd.read_csv can
+    parse data while it is being decoded
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self.buffer:
+            try:
+                self.buffer = memoryview(next(self.chunks))
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self.buffer))
+        b[:n] = self.buffer[:n]
+        self.buffer = self.buffer[n:]
+        return n
+
+
+def decode_chunks(content_string, chunk_size=CHUNK_SIZE):
+    """
+    Decodes a base64 string a chunk at a time. Yields (position, bytes)
+    where position is the number of characters decoded so far.
+    """
+    for i in range(0, len(content_string), chunk_size):
+        end = min(i + chunk_size, len(content_string))
+        yield end, base64.b64decode(content_string[i:end])
+
+
+def read_chunks(byte_chunks, chunk_rows=CHUNK_ROWS):
+    """
+    Parses a csv file given as an iterator of bytes.
+    Yields DataFrames of text columns like read_shots, chunk_rows rows at a time.
+    """
+    stream = io.TextIOWrapper(io.BufferedReader(IterStream(byte_chunks)), encoding='utf-8')
+    with pd.read_csv(stream, chunksize=chunk_rows, **READ_KWARGS) as reader:
+        for raw in reader:
+            yield _strip(raw)
+
+
+def ingest_stream(content_string, backend, batch_size=BATCH_SIZE, chunk_rows=CHUNK_ROWS,
+                  chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Saves a base64 encoded csv file of shots without decoding or parsing
+    all of it at once: decode -> parse -> validate -> insert, one chunk at
+    a time, so memory use does not grow with the file size.
+
+    The rows are written in one transaction that is rolled back if any
+    chunk has errors.
+
+    progress: (callable) Called after every chunk with (fraction, rows)
+
+    Returns (rows, errors, seconds).
+    """
+    t1 = time.perf_counter()
+    total = len(content_string)
+    position = [0]
+
+    def tracked():
+        for end, data in decode_chunks(content_string, chunk_size):
+            position[0] = end
+            yield data
+
+    rows = 0
+    try:
+        with backend.writer() as write:
+            for raw in read_chunks(tracked(), chunk_rows):
+                df = convert(raw)
+                errors = validate(raw, df)
+                if errors:
+                    raise InvalidShots(errors)
+                rows += insert_batches(df, write, batch_size)
+                if progress is not None:
+                    progress(position[0] / total, rows)
+    except InvalidShots as e:
+        return 0, e.errors, time.perf_counter() - t1
+    return rows, [], time.perf_counter() - t1
@@ -0,0 +1,196 @@
+import time
+from itertools import product
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Created by training from the repository root: python -m model_learn.surrogate
+MODEL_PATH = Path(__file__).parent / 'surrogate.npz'
+
+features = ['ball_speed', 'launch_angle', 'side_angle', 'backspin', 'sidespin']
+targets = ['carry', 'side', 'height', 'hang_time', 'landing_angle']
+
+# Range of every feature in the training grid
+RANGES = {
+    'ball_speed': (25, 80),         # [m/s]
+    'launch_angle': (5, 35),        # [degrees]
+    'side_angle': (-10, 10),        # [degrees]
+    'backspin': (1500, 11000),      # [rpm]
+    'sidespin': (-1500, 1500),      # [rpm]
+}
+
+# Conditions of the simulated flights
+P = 101325
+T = 293
+SIM_KWARGS = {'method': 'rk4', 'dt': 0.1}
+
+_model = None
+
+
+def launch_vectors(X):
+    """
+    Returns (v0, spin) arrays of shape (N, 3) from a features array.
+    Backspin is about the x axis and sidespin about the vertical axis.
+    """
+    speed, launch, side, backspin, sidespin = np.asarray(X, dtype=float).T
+    launch = np.radians(launch)
+    side = np.radians(side)
+    v0 = speed[:, None] * np.column_stack([
+        np.cos(launch)*np.sin(side),
+        np.cos(launch)*np.cos(side),
+        np.sin(launch),
+    ])
+    spin = np.column_stack([backspin, np.zeros(len(speed)), sidespin]) / 60
+    return v0, spin
+
+
+def simulate(X, workers=None):
+    """
+    Returns the simulated targets of the launch conditions in X
+    """
+    # Only needed for training, predict() runs without the simulator
+    from aerodynamics import parallel
+
+    v0, spin = launch_vectors(X)
+    result = parallel.simulate_many(v0, spin, P, T, workers=workers, **SIM_KWARGS)
+    return result[targets]
+
+
+def launch_grid(points=7):
+    """
+    Returns a full factorial grid over RANGES with points values per feature
+    """
+    axes = [np.linspace(*RANGES[f], points) for f in features]
+    return pd.DataFrame(list(product(*axes)), columns=features)
+
+
+def launch_samples(n, seed=None):
+    """
+    Returns n launch conditions sampled uniformly within RANGES
+    """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({f: rng.uniform(*RANGES[f], n) for f in features})
+
+
+def generate_data(points=7, workers=None):
+    """
+    Sweeps the simulator over launch_grid and returns (X, y)
+    """
+    X = launch_grid(points)
+    y = simulate(X, workers=workers)
+    return X, y
+
+
+def train(X, y, degree=5, alpha=1e-6):
+    """
+    Returns a fitted polynomial regression of the targets
+    """
+    # Only needed for training, predict() runs without sklearn
+    from sklearn.linear_model import Ridge
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import PolynomialFeatures, StandardScaler
+
+    model = make_pipeline(
+        StandardScaler(),
+        PolynomialFeatures(degree),
+        Ridge(alpha=alpha),
+    )
+    model.fit(X[features].to_numpy(), y[targets].to_numpy())
+    return Surrogate.from_pipeline(model)
+
+
+class Surrogate:
+    """
+    A fitted polynomial regression stored as plain arrays, so predictions
+    are a few numpy operations without the sklearn overhead and the
+    dashboard does not need sklearn to use it.
+    """
+
+    def __init__(self, mean, scale, powers, coef, intercept):
+        self.mean = mean
+        self.scale = scale
+        self.powers = powers
+        self.coef = coef
+        self.intercept = intercept
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        scaler, poly, ridge = [step for _, step in pipeline.steps]
+        return cls(scaler.mean_, scaler.scale_, poly.powers_, ridge.coef_, ridge.intercept_)
+
+    def predict(self, X):
+        """
+        X: (array) Features, shape (N, len(features))
+        Returns an array of shape (N, len(targets))
+        """
+        Xs = (np.asarray(X, dtype=float) - self.mean) / self.scale
+
+        # Table of every feature to every power, then gather the monomials
+        table = Xs[:, :, None] ** np.arange(self.powers.max() + 1)
+        terms = table[:, np.arange(Xs.shape[1]), self.powers].prod(axis=-1)
+        return terms @ self.coef.T + self.intercept
+
+    def save(self, path=MODEL_PATH):
+        np.savez(path, mean=self.mean, scale=self.scale, powers=self.powers,
+                 coef=self.coef, intercept=self.intercept)
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        with np.load(path) as data:
+            return cls(**{key: data[key] for key in data.files})
+
+
+def load(path=MODEL_PATH):
+    global _model
+    _model = Surrogate.load(path)
+    return _model
+
+
+def predict(ball_speed, launch_angle, backspin, side_angle=0, sidespin=0):
+    """
+    Returns a DataFrame with the predicted targets. Arguments can be numbers
+    or arrays, in the units of RANGES. The saved model is loaded on first use.
+    """
+    model = _model if _model is not None else load()
+    X = np.column_stack(np.broadcast_arrays(
+        *[np.atleast_1d(np.asarray(i, dtype=float)) for i in
+          (ball_speed, launch_angle, side_angle, backspin, sidespin)]
+    ))
+    return pd.DataFrame(model.predict(X), columns=targets)
+
+
+def evaluate(model, n=2000, seed=0):
+    """
+    Compares the surrogate with the simulator on random launch conditions.
+    Returns (errors, t_simulator, t_surrogate) where errors holds the mean
+    and max absolute error per target.
+    """
+    X = launch_samples(n, seed)
+
+    t1 = time.perf_counter()
+    y_sim = simulate(X, workers=1)
+    t_sim = time.perf_counter() - t1
+
+    t1 = time.perf_counter()
+    y_pred = pd.DataFrame(model.predict(X[features].to_numpy()), columns=targets)
+    t_pred = time.perf_counter() - t1
+
+    error = (y_pred - y_sim).abs()
+    errors = pd.DataFrame({'mean': error.mean(), 'max': error.max()})
+    return errors, t_sim, t_pred
+
+
+if __name__ == '__main__':
+    t1 = time.time()
+    X, y = generate_data()
+    print(f"Simulated {len(X)} launch conditions in {round(time.time()-t1, 1)} seconds")
+
+    model = train(X, y)
+    model.save()
+
+    errors, t_sim, t_pred = evaluate(model)
+    print(errors.round(3))
+    print(f"Simulator: {1e3*t_sim/2000:.3f} ms/shot")
+    print(f"Surrogate: {1e3*t_pred/2000:.4f} ms/shot")
+    print(f"Speedup: {t_sim/t_pred:.0f}x")
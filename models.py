@@ -5,6 +5,12 @@ Base = declarative_base()
 
 class Shots(Base):
     __tablename__ = 'shots'
+    __table_args__ = (
+        # Per club queries, filtered on date and ordered like the app
+        db.Index('ix_shots_club_date_id', 'club', 'date', 'id'),
+        # Date range queries over all clubs
+        db.Index('ix_shots_date', 'date'),
+    )
 
     enums=('1W', '3W', '4', '5', '6', '7', '8', '9', 'P', '52', '56')
 
@@ -0,0 +1,54 @@
+import pandas as pd
+import sqlalchemy as db
+
+from models import Shots
+
+shots = Shots.__table__
+
+
+def select_shots(clubs=None, start=None, end=None, columns=None):
+    """
+    Returns a SELECT of shots, ordered by id like the shot store, filtered
+    in SQL so the (club, date, id) and (date) indexes are used.
+
+    clubs: (str, list) Club or clubs to include, all if None
+    start: (date, str) First date to include
+    end: (date, str) Last date to include
+    columns: (list) Columns to select besides id, all if None
+    """
+    if columns is None:
+        selected = [shots]
+    else:
+        selected = [shots.c.id] + [shots.c[name] for name in columns if name != 'id']
+
+    query = db.select(*selected).where(*filters(clubs, start, end))
+    return query.order_by(shots.c.id)
+
+
+def filters(clubs=None, start=None, end=None):
+    """
+    Returns the WHERE clauses of a club and date range filter
+    """
+    clauses = []
+    if clubs is not None:
+        clubs = [clubs] if isinstance(clubs, str) else list(clubs)
+        clauses.append(shots.c.club == clubs[0] if len(clubs) == 1 else shots.c.club.in_(clubs))
+    if start is not None:
+        clauses.append(shots.c.date >= pd.Timestamp(start).date())
+    if end is not None:
+        clauses.append(shots.c.date <= pd.Timestamp(end).date())
+    return clauses
+
+
+def read_shots(engine, clubs=None, start=None, end=None, columns=None):
+    """
+    Returns the filtered shots as a DataFrame indexed by id, like the
+    frame of the shot store
+    """
+    query = select_shots(clubs, start, end, columns)
+    with engine.connect() as conn:
+        df = pd.read_sql(query, conn, index_col='id')
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date'])
+    return df
+
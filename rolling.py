@@ -0,0 +1,188 @@
+import bisect
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import aggregates
+
+# Number of club/column histories that rolling statistics are kept for
+CACHE_SIZE = 64
+
+# Number of (window, stat) results kept per history, enough for every mark
+# of the window sliders with the four statistics of the Club details page
+RESULTS = 96
+
+# Quantiles computed together from one sort of the windows, those of the
+# error band
+QUANTILES = [0.25, 0.5, 0.75]
+
+# Number of window values sorted at once
+CHUNK = 2**20
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+class RollingSeries:
+    """
+    Rolling statistics over the values of one club and column (without
+    missing values), cached per window and statistic.
+
+    Means and standard deviations are read from prefix sums of the values
+    and their squares. For quantiles the windows are sorted once for all of
+    QUANTILES, and the sorted last window is kept. When shots are appended
+    with extend() only the new positions are computed.
+    """
+
+    def __init__(self, ids, values):
+        self.ids = ids
+        self.values = values
+        # Sums of the deviations from the first value, exact for integers
+        self.ref = float(values[0]) if len(values) else 0.0
+        d = values - self.ref
+        self.sums = np.concatenate([[0.0], np.cumsum(d)])
+        self.squares = np.concatenate([[0.0], np.cumsum(d*d)])
+        self.results = OrderedDict()
+
+    def __len__(self):
+        return len(self.values)
+
+    def extends(self, ids):
+        """
+        True if ids are the ids of this series with new ones after them
+        """
+        n = len(self.ids)
+        return len(ids) >= n and np.array_equal(ids[:n], self.ids)
+
+    def extend(self, ids, values):
+        n = len(self)
+        if len(values) == n:
+            return
+        d = values[n:] - self.ref
+        self.sums = np.concatenate([self.sums, self.sums[-1] + np.cumsum(d)])
+        self.squares = np.concatenate([self.squares, self.squares[-1] + np.cumsum(d*d)])
+        self.ids = ids
+        self.values = values
+
+        for (window, stat), result in self.results.items():
+            if stat in ('mean', 'stddev'):
+                self.results[window, stat] = np.concatenate([result, self._moments(n, window, stat)])
+            else:
+                self.results[window, stat] = self._extend_quantile(result, n, window, stat)
+
+    def get(self, window, stat):
+        """
+        Same as pd.Series(values).rolling(window).<stat>().to_numpy()
+
+        stat: (str or float) 'mean', 'stddev', 'median' or the q of a quantile
+        """
+        if stat == 'median':
+            stat = 0.5
+        key = (window, stat)
+        if key not in self.results:
+            if stat in ('mean', 'stddev'):
+                self.results[key] = self._moments(0, window, stat)
+            else:
+                qs = sorted(set(QUANTILES) | {stat})
+                last = sorted(self.values[-window:].tolist())
+                for q, values in zip(qs, self._quantiles(window, qs)):
+                    self.results.setdefault((window, q), (values, list(last)))
+            while len(self.results) > RESULTS:
+                self.results.popitem(last=False)
+        self.results.move_to_end(key)
+        result = self.results[key]
+        return result if stat in ('mean', 'stddev') else result[0]
+
+    def _moments(self, start, window, stat):
+        """
+        Mean or standard deviation of the windows ending at start and after
+        """
+        n = len(self)
+        out = np.full(n - start, np.nan)
+        end = np.arange(max(start, window - 1), n) + 1
+        if not len(end) or (stat == 'stddev' and window < 2):
+            return out
+
+        s = self.sums[end] - self.sums[end - window]
+        if stat == 'mean':
+            value = s/window + self.ref
+        else:
+            squares = self.squares[end] - self.squares[end - window]
+            value = np.sqrt(np.clip((squares - s*s/window) / (window - 1), 0, None))
+        out[end - 1 - start] = value
+        return out
+
+    def _quantiles(self, window, qs):
+        """
+        Returns the rolling q-quantiles for every q of qs, with linear
+        interpolation like pd.Series.rolling().quantile()
+        """
+        n = len(self)
+        out = [np.full(n, np.nan) for _ in qs]
+        if window > n:
+            return out
+
+        windows = np.lib.stride_tricks.sliding_window_view(self.values, window)
+        step = max(1, CHUNK // window)
+        for start in range(0, len(windows), step):
+            chunk = np.sort(windows[start:start+step], axis=1)
+            rows = slice(start + window - 1, start + window - 1 + len(chunk))
+            for values, q in zip(out, qs):
+                position = q * (window - 1)
+                lo = math.floor(position)
+                hi = min(lo + 1, window - 1)
+                values[rows] = chunk[:, lo] + (position - lo) * (chunk[:, hi] - chunk[:, lo])
+        return out
+
+    def _extend_quantile(self, result, start, window, q):
+        values, sorted_window = result
+        new = []
+        for i in range(start, len(self)):
+            if len(sorted_window) == window:
+                del sorted_window[bisect.bisect_left(sorted_window, self.values[i - window])]
+            bisect.insort(sorted_window, self.values[i])
+            new.append(interpolate(sorted_window, q) if len(sorted_window) == window else np.nan)
+        return np.concatenate([values, new]), sorted_window
+
+
+def interpolate(sorted_values, q):
+    """
+    The q-quantile of sorted values with linear interpolation, like np.percentile
+    """
+    position = q * (len(sorted_values) - 1)
+    lo = math.floor(position)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (position - lo) * (sorted_values[hi] - sorted_values[lo])
+
+
+def get(df, club, column='total_distance', window=20, stat='stddev'):
+    """
+    Rolling statistic over the last window shots of club, the same as
+    df.groupby('club').get_group(club)[column].dropna().rolling(window).<stat>()
+    as an array. The statistics are cached per club, column, window and
+    stat, and extended when the same history comes back with new shots.
+
+    stat: (str or float) 'mean', 'stddev', 'median' or the q of a quantile
+
+    Returns an array with nan for the first window-1 shots.
+    """
+    ids, values = aggregates.get(df).present(club, column)
+
+    with _lock:
+        key = (club, column, ids[0] if len(ids) else None)
+        series = _cache.get(key)
+        if series is None or not series.extends(ids):
+            series = _cache[key] = RollingSeries(ids, values)
+        else:
+            series.extend(ids, values)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+        return series.get(window, stat)
+
+
+def clear():
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,239 @@
+import copy
+import threading
+
+import numpy as np
+import pandas as pd
+import sqlalchemy as db
+
+import aggregates
+from models import Shots
+from streaming import ClubStats
+from utils import club_enum
+
+
+# Clubs in the order of the dashboard, stored as int8 codes
+CLUB_DTYPE = pd.CategoricalDtype(list(club_enum))
+
+
+def column_dtype(column):
+    """
+    Returns the dtype used to store a column of the shots table:
+        club: categorical in club_enum order
+        integers: the nullable integer of the size of the database type
+            (Int16 for SmallInteger, Int32 for Integer, Int64 for
+            BigInteger), values with a mask for missing values
+        floats: float32 with nan for missing values
+        missed: boolean, bool values with a mask
+        date: datetime64[s], pandas has no datetime64[D]
+        id: int64
+    """
+    if column.primary_key:
+        return np.dtype('int64')
+    if isinstance(column.type, db.Enum):
+        return CLUB_DTYPE
+    if isinstance(column.type, db.Date):
+        return np.dtype('datetime64[s]')
+    if isinstance(column.type, db.Boolean):
+        return pd.BooleanDtype()
+    if isinstance(column.type, db.Float):
+        return np.dtype('float32')
+    if isinstance(column.type, db.SmallInteger):
+        return pd.Int16Dtype()
+    if isinstance(column.type, db.BigInteger):
+        return pd.Int64Dtype()
+    if isinstance(column.type, db.Integer):
+        return pd.Int32Dtype()
+    return np.dtype('object')
+
+
+def is_masked(dtype):
+    return isinstance(dtype, (pd.Int16Dtype, pd.Int32Dtype, pd.Int64Dtype, pd.BooleanDtype))
+
+
+def buffer_dtype(dtype):
+    """
+    Returns the numpy dtype of the array a column is kept in by ShotStore
+    """
+    if isinstance(dtype, pd.CategoricalDtype):
+        return np.dtype('int8')
+    if is_masked(dtype):
+        return dtype.numpy_dtype
+    return dtype
+
+
+def compact_array(values, dtype):
+    """
+    Returns a Series of shots values converted to a dtype of column_dtype().
+    Raises if an integer does not fit in the dtype.
+    """
+    if isinstance(dtype, pd.CategoricalDtype):
+        return pd.Categorical(values, dtype=dtype)
+    if isinstance(dtype, pd.api.extensions.ExtensionDtype):
+        return pd.array(values, dtype=dtype)
+    if dtype.kind == 'M':
+        return np.asarray(pd.to_datetime(values), dtype=dtype)
+    if dtype.kind == 'f':
+        return values.to_numpy(dtype=dtype, na_value=np.nan)
+    return values.to_numpy(dtype=dtype)
+
+
+def compact_frame(df, table=Shots.__table__):
+    """
+    Returns a DataFrame of shots, e.g. from pd.read_sql, with the columns of
+    the shots table in the dtypes of column_dtype()
+    """
+    dtypes = {c.name: column_dtype(c) for c in table.columns if c.name in df.columns}
+    return df.assign(**{name: compact_array(df[name], dtype) for name, dtype in dtypes.items()})
+
+
+def memory_report(df):
+    """
+    Returns a DataFrame with the dtype, MB and bytes per row of every column
+    of df, the index and the total
+    """
+    usage = df.memory_usage(index=True, deep=True)
+    dtypes = df.dtypes.astype(str).reindex(usage.index).fillna(str(df.index.dtype))
+    report = pd.DataFrame({'dtype': dtypes, 'MB': usage / 1e6, 'bytes/row': usage / max(len(df), 1)})
+    report.loc['total'] = ['', report['MB'].sum(), report['bytes/row'].sum()]
+    return report
+
+
+class ShotStore:
+    """
+    In-memory copy of the shots table that is kept up to date by only
+    fetching rows with a higher id than the last one seen.
+
+    The rows are kept in compact column arrays with spare capacity (see
+    column_dtype), so new shots are appended without copying the history,
+    and frame() returns a DataFrame that is a view of the arrays: club
+    codes, and values and masks of the nullable columns.
+
+    Per-club statistics of the distance columns are updated as shots are
+    appended (see streaming.ClubStats) and a snapshot of them is used for
+    the describe tables of the frames handed out by frame().
+    """
+
+    def __init__(self, table=Shots.__table__):
+        self.table = table
+        self.dtypes = {c.name: column_dtype(c) for c in table.columns}
+        self.columns = {name: np.empty(0, buffer_dtype(dtype)) for name, dtype in self.dtypes.items()}
+        self.masks = {name: np.empty(0, bool) for name, dtype in self.dtypes.items() if is_masked(dtype)}
+        self.n = 0
+        self.last_id = 0
+        self.version = 0
+        self.stats = ClubStats()
+        self._frame = None
+        # Callbacks of one worker run in threads and share the store
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return self.n
+
+    @classmethod
+    def from_arrays(cls, n, columns, masks, stats, table=Shots.__table__):
+        """
+        Returns a store on existing arrays with n rows, e.g. memory-mapped
+        from a snapshot. New rows are written into the arrays while they
+        have spare capacity, after that the arrays are copied to memory.
+        """
+        store = cls(table)
+        store.columns = columns
+        store.masks = masks
+        store.stats = stats
+        store.n = n
+        store.last_id = int(columns['id'][n-1]) if n else 0
+        store.version = 1
+        return store
+
+    def arrays(self):
+        """
+        Returns (n, columns, masks, stats) of the store at one point in
+        time: the first n rows of the arrays and a copy of the statistics
+        """
+        with self._lock:
+            return self.n, dict(self.columns), dict(self.masks), copy.deepcopy(self.stats)
+
+    def refresh(self, backend):
+        """
+        Fetches the rows added since the last refresh.
+        Returns the number of new rows.
+
+        backend: Storage backend, see storage.create_backend
+        """
+        with self._lock:
+            return self._append(backend.shots_after(self.last_id))
+
+    def append(self, new):
+        """
+        Appends the rows of a DataFrame with the columns of the shots table
+        and an id column. Returns the number of rows appended.
+        """
+        with self._lock:
+            return self._append(new)
+
+    def _append(self, new):
+        if new.empty:
+            return 0
+
+        # Every column is converted before anything is written, so a batch
+        # that does not fit leaves the store as it was
+        converted, masks = {}, {}
+        for name, dtype in self.dtypes.items():
+            values = compact_array(new[name], dtype)
+            if isinstance(dtype, pd.CategoricalDtype):
+                values = values.codes
+            elif is_masked(dtype):
+                masks[name] = values.isna()
+                values = values.to_numpy(dtype=dtype.numpy_dtype, na_value=0)
+            converted[name] = values
+
+        k = len(new)
+        if self.n + k > self.capacity:
+            self._grow(self.n + k)
+        for name, values in converted.items():
+            self.columns[name][self.n:self.n+k] = values
+        for name, mask in masks.items():
+            self.masks[name][self.n:self.n+k] = mask
+
+        self.stats.update_frame(new)
+        self.n += k
+        self.last_id = int(self.columns['id'][self.n-1])
+        self.version += 1
+        self._frame = None
+        return k
+
+    @property
+    def capacity(self):
+        return len(self.columns['id'])
+
+    def _grow(self, needed):
+        capacity = max(needed, 2*self.capacity, 1024)
+        for arrays in (self.columns, self.masks):
+            for name, column in arrays.items():
+                new = np.empty(capacity, column.dtype)
+                new[:self.n] = column[:self.n]
+                arrays[name] = new
+
+    def _array(self, name):
+        dtype = self.dtypes[name]
+        values = self.columns[name][:self.n]
+        if isinstance(dtype, pd.CategoricalDtype):
+            return pd.Categorical.from_codes(values, dtype=dtype)
+        if is_masked(dtype):
+            return dtype.construct_array_type()(values, self.masks[name][:self.n])
+        return values
+
+    def frame(self):
+        """
+        Returns the shots as a DataFrame indexed by id, like
+        pd.read_sql_table('shots', engine, index_col='id', parse_dates=['date'])
+        but in the dtypes of column_dtype().
+        The frame is only rebuilt when new rows have arrived.
+        """
+        with self._lock:
+            if self._frame is None:
+                data = {name: self._array(name) for name in self.columns if name != 'id'}
+                index = pd.Index(self.columns['id'][:self.n], name='id')
+                self._frame = pd.DataFrame(data, index=index, copy=False)
+                aggregates.get(self._frame, self.version, self.stats.snapshot())
+            return self._frame
@@ -0,0 +1,148 @@
+import json
+import os
+import pickle
+import shutil
+import uuid
+
+import numpy as np
+
+from logger import log
+from shotstore import ShotStore
+
+# Directory of the snapshots, overridden by the SNAPSHOT_PATH environment variable
+DEFAULT_PATH = os.path.join('data', 'snapshot')
+
+# A new snapshot is written at startup when more shots than this had to be
+# fetched from the database
+SNAPSHOT_DELTA = 10000
+
+# Spare rows at the end of every column file. Workers append new shots in
+# place, only the pages they write to are copied.
+SPARE_ROWS = 4096
+
+# Changed when the layout of the files changes, older snapshots are ignored
+FORMAT = 4
+
+
+def snapshot_path(path=None):
+    return path or os.environ.get('SNAPSHOT_PATH', DEFAULT_PATH)
+
+
+def save(store, path=None, source=None):
+    """
+    Writes the shot store to a new snapshot and makes it the current one.
+    Every column (and mask of missing values) is one npy file, with the
+    id of the last shot as watermark in meta.json. Older snapshots are
+    removed, workers that have them mapped keep reading them.
+
+    source: (str) Where the shots come from, see load()
+
+    Returns the directory of the snapshot.
+    """
+    path = snapshot_path(path)
+    n, columns, masks, stats = store.arrays()
+    last_id = int(columns['id'][n-1]) if n else 0
+
+    name = f"{last_id:012d}-{uuid.uuid4().hex[:8]}"
+    tmp = os.path.join(path, name + '.tmp')
+    os.makedirs(tmp)
+
+    for kind, arrays in [('column', columns), ('mask', masks)]:
+        for column, array in arrays.items():
+            out = np.lib.format.open_memmap(
+                os.path.join(tmp, f"{kind}-{column}.npy"), mode='w+',
+                dtype=array.dtype, shape=(n + SPARE_ROWS,),
+            )
+            out[:n] = array[:n]
+            out.flush()
+            del out
+
+    with open(os.path.join(tmp, 'stats.pickle'), 'wb') as fp:
+        pickle.dump(stats, fp)
+
+    meta = {
+        'format': FORMAT,
+        'n': n,
+        'last_id': last_id,
+        'source': source,
+        'dtypes': {column: str(dtype) for column, dtype in store.dtypes.items()},
+    }
+    with open(os.path.join(tmp, 'meta.json'), 'w') as fp:
+        json.dump(meta, fp)
+
+    os.rename(tmp, os.path.join(path, name))
+    current = os.path.join(path, f"CURRENT.{uuid.uuid4().hex[:8]}")
+    with open(current, 'w') as fp:
+        fp.write(name)
+    os.replace(current, os.path.join(path, 'CURRENT'))
+
+    # Another process may have saved a snapshot at the same time
+    with open(os.path.join(path, 'CURRENT')) as fp:
+        keep = fp.read().strip()
+    for old in os.listdir(path):
+        if old != keep and not old.startswith('CURRENT') and not old.endswith('.tmp'):
+            shutil.rmtree(os.path.join(path, old), ignore_errors=True)
+    return os.path.join(path, name)
+
+
+def load(path=None, source=None):
+    """
+    Returns a ShotStore on the current snapshot, memory-mapped copy-on-write
+    so the workers share its pages, or None if there is no usable snapshot
+
+    source: (str) Only a snapshot saved with the same source is used, e.g.
+        the repr of the storage backend
+    """
+    path = snapshot_path(path)
+    try:
+        with open(os.path.join(path, 'CURRENT')) as fp:
+            directory = os.path.join(path, fp.read().strip())
+        with open(os.path.join(directory, 'meta.json')) as fp:
+            meta = json.load(fp)
+    except FileNotFoundError:
+        return None
+
+    empty = ShotStore()
+    dtypes = {column: str(dtype) for column, dtype in empty.dtypes.items()}
+    if meta['format'] != FORMAT or meta['dtypes'] != dtypes or meta['source'] != source:
+        log.info(f"Snapshot {directory} is of another version or database, not used")
+        return None
+
+    def mapped(kind, column):
+        return np.load(os.path.join(directory, f"{kind}-{column}.npy"), mmap_mode='c')
+
+    # In the column order of the store
+    columns = {column: mapped('column', column) for column in empty.columns}
+    masks = {column: mapped('mask', column) for column in empty.masks}
+    with open(os.path.join(directory, 'stats.pickle'), 'rb') as fp:
+        stats = pickle.load(fp)
+
+    return ShotStore.from_arrays(meta['n'], columns, masks, stats)
+
+
+def open_store(backend, path=None, delta=SNAPSHOT_DELTA):
+    """
+    Returns a ShotStore with every shot: the current snapshot, and the shots
+    saved after its watermark fetched from backend. A new snapshot is
+    written when there was none or more than delta shots were fetched.
+
+    backend: Storage backend, see storage.create_backend
+    """
+    try:
+        store = load(path, repr(backend))
+    except Exception as e:
+        # E.g. removed by another worker while it was opened
+        log.warning(f"Could not load snapshot: {e}")
+        store = None
+
+    fresh = store is None
+    if fresh:
+        store = ShotStore()
+    fetched = store.refresh(backend)
+
+    if fresh or fetched > delta:
+        try:
+            save(store, path, repr(backend))
+        except OSError as e:
+            log.warning(f"Could not save snapshot: {e}")
+    return store
@@ -0,0 +1,279 @@
+import posixpath
+import re
+import zipfile
+from xml.etree import ElementTree
+
+import numpy as np
+import pandas as pd
+
+# File endings that read_sheet can read
+EXCEL_TYPES = ('xlsx', 'xlsm')
+ODS_TYPES = ('ods',)
+
+NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+DOC_RELS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PKG_RELS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+# Built-in number formats that are dates or times
+DATE_FORMATS = set(range(14, 23)) | {45, 46, 47}
+
+# Day zero of the Excel 1900 date system
+EXCEL_EPOCH = '1899-12-30'
+
+
+def file_type(filename):
+    return filename.rsplit('.', 1)[-1].lower()
+
+
+def read_sheet(source, columns=None, sheet=None, required=(), kind='xlsx'):
+    """
+    Reads columns of a spreadsheet into a DataFrame of python values, with
+    None for empty cells. Numbers are floats, cells with a date format are
+    Timestamps and everything else is text.
+
+    Excel files are read straight from the sheet XML: only the header row
+    of the other sheets is parsed and values are only kept for the wanted
+    columns, which are then converted one column at a time.
+
+    source: (str, file) Path or file object of the workbook
+    columns: (list) Names of the columns to read, all if None
+    sheet: (str, int) Sheet name or index. If None, the first sheet with
+        all required columns in the header row is used.
+    required: (list) Column names used to find the sheet
+    kind: (str) File type, see EXCEL_TYPES and ODS_TYPES
+
+    Returns a DataFrame with the wanted columns in the order of the sheet.
+    """
+    if kind in ODS_TYPES:
+        return _read_ods(source, columns, sheet, required)
+
+    with Workbook(source) as workbook:
+        path = workbook.find_sheet(sheet, required)
+        return workbook.read(path, columns)
+
+
+class Workbook:
+    """
+    Minimal reader of the cell values in an xlsx file
+    """
+
+    def __init__(self, source):
+        self.zip = zipfile.ZipFile(source)
+        self.sheets = self._sheets()
+        self._strings = None
+        self._date_styles = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.zip.close()
+
+    def _xml(self, path):
+        with self.zip.open(path) as f:
+            return ElementTree.parse(f).getroot()
+
+    def _sheets(self):
+        """
+        Returns a list of (name, path) of the worksheets in workbook order
+        """
+        rels = self._xml('xl/_rels/workbook.xml.rels')
+        targets = {rel.get('Id'): rel.get('Target') for rel in rels.iter(PKG_RELS + 'Relationship')}
+
+        sheets = []
+        for sheet in self._xml('xl/workbook.xml').iter(NS + 'sheet'):
+            target = targets[sheet.get(DOC_RELS + 'id')]
+            if target.startswith('/'):
+                path = target[1:]
+            else:
+                path = posixpath.normpath(posixpath.join('xl', target))
+            sheets.append((sheet.get('name'), path))
+        return sheets
+
+    @property
+    def strings(self):
+        if self._strings is None:
+            if 'xl/sharedStrings.xml' in self.zip.namelist():
+                root = self._xml('xl/sharedStrings.xml')
+                self._strings = [''.join(t.text or '' for t in si.iter(NS + 't')) for si in root.iter(NS + 'si')]
+            else:
+                self._strings = []
+        return self._strings
+
+    @property
+    def date_styles(self):
+        """
+        Returns the set of cell style indices with a date number format
+        """
+        if self._date_styles is None:
+            self._date_styles = set()
+            if 'xl/styles.xml' in self.zip.namelist():
+                root = self._xml('xl/styles.xml')
+                dates = set(DATE_FORMATS)
+                for fmt in root.iter(NS + 'numFmt'):
+                    if is_date_format(fmt.get('formatCode', '')):
+                        dates.add(int(fmt.get('numFmtId')))
+                xfs = root.find(NS + 'cellXfs')
+                if xfs is not None:
+                    for i, xf in enumerate(xfs.iter(NS + 'xf')):
+                        if int(xf.get('numFmtId', 0)) in dates:
+                            self._date_styles.add(str(i))
+        return self._date_styles
+
+    def rows(self, path):
+        """
+        Yields the row elements of a sheet in order. Each row is cleared
+        when the next one is read, so the sheet is never held in memory.
+        """
+        row_tag = NS + 'row'
+        with self.zip.open(path) as f:
+            for event, elem in ElementTree.iterparse(f):
+                if elem.tag == row_tag:
+                    yield elem
+                    elem.clear()
+
+    def value(self, cell):
+        """
+        Returns the raw text of the value of a cell element, None if empty
+        """
+        v = cell.find(NS + 'v')
+        if v is not None:
+            return v.text
+        inline = cell.find(NS + 'is')
+        return None if inline is None else ''.join(inline.itertext())
+
+    def header(self, path):
+        """
+        Returns ({column letters: name}, row number) of the first row of a sheet
+        """
+        for row in self.rows(path):
+            header = {}
+            for cell in row:
+                ref = cell.get('r')
+                header[ref.rstrip('0123456789')] = self._text(cell.get('t'), self.value(cell))
+            return header, int(row.get('r'))
+        return {}, 0
+
+    def find_sheet(self, sheet=None, required=()):
+        if isinstance(sheet, int):
+            return self.sheets[sheet][1]
+        if sheet is not None:
+            return dict(self.sheets)[sheet]
+
+        for name, path in self.sheets:
+            names = set(self.header(path)[0].values())
+            if all(column in names for column in required):
+                return path
+        return self.sheets[0][1]
+
+    def _text(self, kind, value):
+        if value is None:
+            return ''
+        if kind == 's':
+            value = self.strings[int(value)]
+        return value.strip()
+
+    def read(self, path, columns=None):
+        """
+        Returns the wanted columns of a sheet with the first row as header
+        """
+        header, header_row = self.header(path)
+        wanted = {c: name for c, name in header.items() if name and (columns is None or name in columns)}
+        data = {c: ([], [], []) for c in wanted}
+        date_styles = self.date_styles
+        v_tag = NS + 'v'
+
+        last = header_row
+        for row in self.rows(path):
+            r = int(row.get('r'))
+            if r <= header_row:
+                continue
+            for cell in row:
+                ref = cell.get('r')
+                col = ref.rstrip('0123456789')
+                if col not in wanted:
+                    continue
+                v = cell.find(v_tag)
+                value = v.text if v is not None else self.value(cell)
+                if value is None:
+                    continue
+                kind = cell.get('t')
+                if kind in (None, 'n') and cell.get('s') in date_styles:
+                    kind = 'date'
+                rows, kinds, values = data[col]
+                rows.append(r)
+                kinds.append(kind)
+                values.append(value)
+                last = r
+
+        order = sorted(wanted, key=lambda c: (len(c), c))
+        df = pd.DataFrame({
+            wanted[c]: self._column(*data[c], last - header_row, header_row + 1) for c in order
+        })
+        # Rows that are empty in every wanted column
+        return df[df.notna().any(axis=1)]
+
+    def _column(self, rows, kinds, values, n, first_row):
+        """
+        Converts the raw values of one column, by cell type, to an object
+        array of length n
+        """
+        out = np.full(n, None, dtype=object)
+        if not rows:
+            return out
+
+        idx = np.array(rows) - first_row
+        kinds = np.array(kinds, dtype=object)
+        values = np.array(values, dtype=object)
+
+        numbers = pd.isna(kinds) | (kinds == 'n')
+        if numbers.any():
+            out[idx[numbers]] = values[numbers].astype(float)
+
+        dates = kinds == 'date'
+        if dates.any():
+            days = values[dates].astype(float)
+            out[idx[dates]] = np.array(pd.to_datetime(days, unit='D', origin=EXCEL_EPOCH), dtype=object)
+
+        shared = kinds == 's'
+        if shared.any():
+            strings = np.array(self.strings, dtype=object)
+            out[idx[shared]] = strings[values[shared].astype(int)]
+
+        text = (kinds == 'str') | (kinds == 'inlineStr') | (kinds == 'd')
+        out[idx[text]] = values[text]
+
+        booleans = kinds == 'b'
+        out[idx[booleans]] = values[booleans] == '1'
+        return out
+
+
+def is_date_format(code):
+    """
+    Returns True if an Excel number format code shows a date or time
+    """
+    code = re.sub(r'"[^"]*"|\[[^\]]*\]|\\.', '', code)
+    return re.search(r'[dmyhs]', code, re.IGNORECASE) is not None
+
+
+def _read_ods(source, columns, sheet, required):
+    # odfpy parses the whole document anyway, so this goes through pandas
+    usecols = None if columns is None else (lambda name: name.strip() in columns)
+    with pd.ExcelFile(source, engine='odf') as workbook:
+        if sheet is None:
+            sheet = _find_ods_sheet(workbook, required)
+        df = workbook.parse(sheet, usecols=usecols, dtype=object)
+    df.columns = df.columns.str.strip()
+    return df.astype(object).where(df.notna(), None)
+
+
+def _find_ods_sheet(workbook, required=()):
+    """
+    Returns the name of the first sheet with all required columns in the
+    header row, like Workbook.find_sheet, or the first sheet
+    """
+    for name in workbook.sheet_names:
+        names = {str(column).strip() for column in workbook.parse(name, nrows=0).columns}
+        if all(column in names for column in required):
+            return name
+    return 0
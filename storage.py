@@ -0,0 +1,418 @@
+import glob
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import sqlalchemy as db
+
+import aggregates
+import database
+import queries
+from models import Shots
+from shotstore import compact_frame
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Distance columns whose per-club statistics a backend can compute, see stats()
+STAT_COLUMNS = ['total_distance', 'carry_distance']
+
+# Number of query results kept by cached_shots
+CACHE_SIZE = 16
+
+_cache = OrderedDict()
+
+
+def create_backend(name=None, **kwargs):
+    """
+    Returns the storage backend selected by name or the STORAGE_BACKEND
+    environment variable:
+        'sql': MySQL or SQLite through SQLAlchemy, see database.py (default)
+        'duckdb': Parquet files queried with DuckDB, in STORAGE_PATH
+    """
+    name = name or os.environ.get('STORAGE_BACKEND', 'sql')
+    if name not in BACKENDS:
+        raise Exception(f"Unknown storage backend {name}, use one of {list(BACKENDS)}")
+    return BACKENDS[name](**kwargs)
+
+
+class SQLBackend:
+    """
+    Shots in a SQL database. Filtering is done in SQL, the per-club
+    statistics in pandas since MySQL has no quantiles.
+
+    engine: (Engine) Defaults to database.init(uri)
+    """
+
+    stats_in_database = False
+
+    def __init__(self, engine=None, uri=None):
+        self.engine = engine if engine is not None else database.init(uri)
+
+    def __repr__(self):
+        return f"SQLBackend({self.engine.url!r})"
+
+    def shots_after(self, last_id):
+        """
+        Returns the shots with id > last_id, ordered by id, with an id column
+        """
+        table = Shots.__table__
+        query = db.select(table).where(table.c.id > last_id).order_by(table.c.id)
+        with self.engine.connect() as conn:
+            return pd.read_sql(query, conn)
+
+    def read_shots(self, clubs=None, start=None, end=None, columns=None):
+        return queries.read_shots(self.engine, clubs, start, end, columns)
+
+    @contextmanager
+    def writer(self):
+        """
+        Context manager that yields write(records), where records is a list
+        of dicts with shots table columns. Everything written is committed
+        together at the end, or nothing if an exception is raised.
+        """
+        insert = Shots.__table__.insert()
+        with self.engine.begin() as conn:
+            yield lambda records: conn.execute(insert, records)
+
+    def describe(self, column, clubs=None, start=None, end=None):
+        df = self.read_shots(clubs, start, end, columns=['club', column])
+        return aggregates.ClubAggregates(df).describe(column)
+
+
+class DuckDBBackend:
+    """
+    Shots in Parquet files queried with DuckDB, for local use and analytic
+    workloads: the per-club statistics of the dashboard run as columnar SQL.
+    Rolling windows are computed by rolling.py for every backend, where they
+    are cached and extended as shots are added.
+
+    Every write adds one Parquet file, files are never changed after that.
+    They are merged when there are more than max_parts, and queries that
+    lose a file to the merge are run again. Writes are serialized within a
+    process; several processes should not write to the same directory.
+
+    path: (str) Directory of the Parquet files, defaults to STORAGE_PATH
+        or ./data/shots
+    """
+
+    stats_in_database = True
+
+    def __init__(self, path=None, max_parts=16):
+        if duckdb is None:
+            raise Exception("The duckdb backend needs the duckdb package: pip install -r requirements-duckdb.txt")
+        self.path = path or os.environ.get('STORAGE_PATH', os.path.join('data', 'shots'))
+        self.max_parts = max_parts
+        os.makedirs(self.path, exist_ok=True)
+        self.con = duckdb.connect()
+        # Safe since a file name is never reused for other content
+        self.con.execute("SET parquet_metadata_cache = true")
+        self._lock = threading.Lock()
+        self._last_id = None
+        # Held while files are swapped by compact(), so parts() never lists
+        # a merged file together with the files it replaces
+        self._files_lock = threading.Lock()
+
+    def __repr__(self):
+        return f"DuckDBBackend({self.path!r})"
+
+    def parts(self):
+        with self._files_lock:
+            return sorted(glob.glob(os.path.join(self.path, 'shots-*.parquet')))
+
+    def query(self, sql, params=None):
+        """
+        Runs a query over the shots view and returns a DataFrame.
+        Every call uses its own cursor, so callbacks in threads can query.
+        """
+        for attempt in range(3):
+            parts = self.parts()
+            con = self.con.cursor()
+            try:
+                if parts:
+                    con.execute(f"CREATE TEMP VIEW shots AS SELECT * FROM read_parquet({parts!r})")
+                else:
+                    con.execute(f"CREATE TEMP VIEW shots AS SELECT * FROM ({empty_select()})")
+                return con.execute(sql, params or []).df()
+            except duckdb.IOException:
+                # A file was removed by compact() while reading
+                if parts == self.parts():
+                    raise
+            finally:
+                con.close()
+        raise Exception("Shots files keep changing, try again")
+
+    def shots_after(self, last_id):
+        return pandas_types(self.query("SELECT * FROM shots WHERE id > ? ORDER BY id", [last_id]))
+
+    def read_shots(self, clubs=None, start=None, end=None, columns=None):
+        where, params = sql_filters(clubs, start, end)
+        selected = '*' if columns is None else ', '.join(['id'] + [c for c in columns if c != 'id'])
+        df = self.query(f"SELECT {selected} FROM shots {where} ORDER BY id", params)
+        return pandas_types(df).set_index('id')
+
+    @contextmanager
+    def writer(self):
+        """
+        Context manager that yields write(records), like SQLBackend.writer.
+        Every batch is written to its own staged Parquet file as it arrives,
+        so an upload is never held in memory. The staged files are merged
+        into one part at the end, which appears in a single rename, or are
+        removed if an exception is raised.
+
+        write also takes a DataFrame with shots table columns (without id).
+        """
+        with self._lock:
+            if self._last_id is None:
+                self._last_id = int(self.query("SELECT coalesce(max(id), 0) AS id FROM shots")['id'][0])
+            first_id = self._last_id + 1
+            staged = []
+            count = [0]
+
+            def write(records):
+                df = records if isinstance(records, pd.DataFrame) else pd.DataFrame.from_records(records)
+                if df.empty:
+                    return
+                start = first_id + count[0]
+                df = typed_frame(df, np.arange(start, start + len(df), dtype='int64'))
+                # Not matched by parts() until published
+                name = os.path.join(self.path, f".staged-{start:012d}-{uuid.uuid4().hex[:8]}.parquet")
+                staged.append(name)
+                self._copy(df, name)
+                count[0] += len(df)
+
+            try:
+                yield write
+                if staged:
+                    self._publish(staged, first_id)
+                    self._last_id = first_id + count[0] - 1
+            finally:
+                for name in staged:
+                    if os.path.exists(name):
+                        os.remove(name)
+
+            if staged and len(self.parts()) > self.max_parts:
+                self.compact()
+
+    def write_frame(self, df):
+        """
+        Saves the shots of a DataFrame with shots table columns (without
+        id) as a new Parquet file. Returns the number of rows.
+        """
+        with self.writer() as write:
+            write(df)
+        return len(df)
+
+    def _copy(self, df, name):
+        con = self.con.cursor()
+        try:
+            con.register('new_shots', df)
+            con.execute(f"COPY (SELECT {cast_columns()} FROM new_shots) TO '{name}' (FORMAT PARQUET)")
+        finally:
+            con.close()
+
+    def _publish(self, staged, first_id):
+        """
+        Makes the staged files of one writer visible to queries as one part
+        """
+        name = self.part_name(first_id)
+        if len(staged) == 1:
+            os.replace(staged[0], name)
+            return
+        tmp = f"{name}.{uuid.uuid4().hex}.tmp"
+        con = self.con.cursor()
+        try:
+            con.execute(f"COPY (SELECT * FROM read_parquet({staged!r}) ORDER BY id) TO '{tmp}' (FORMAT PARQUET)")
+        finally:
+            con.close()
+        os.replace(tmp, name)
+
+    def part_name(self, first_id):
+        # Named by first id so parts() lists them in id order
+        return os.path.join(self.path, f"shots-{first_id:012d}-{uuid.uuid4().hex[:8]}.parquet")
+
+    def compact(self):
+        """
+        Merges all Parquet files into one
+        """
+        parts = self.parts()
+        if len(parts) < 2:
+            return
+        name = self.part_name(int(os.path.basename(parts[0]).split('-')[1]))
+        tmp = f"{name}.{uuid.uuid4().hex}.tmp"
+        con = self.con.cursor()
+        try:
+            con.execute(f"COPY (SELECT * FROM read_parquet({parts!r}) ORDER BY id) TO '{tmp}' (FORMAT PARQUET)")
+        finally:
+            con.close()
+        with self._files_lock:
+            os.replace(tmp, name)
+            for part in parts:
+                os.remove(part)
+
+    def describe(self, column, clubs=None, start=None, end=None):
+        """
+        Same table as df.groupby('club').describe()[column], computed by DuckDB
+        """
+        where, params = sql_filters(clubs, start, end)
+        df = self.query(f"""
+            SELECT club,
+                count({column}) AS "count",
+                avg({column}) AS "mean",
+                min({column}) AS "min",
+                quantile_cont({column}, 0.25) AS "25%",
+                quantile_cont({column}, 0.5) AS "50%",
+                quantile_cont({column}, 0.75) AS "75%",
+                max({column}) AS "max",
+                stddev_samp({column}) AS "std"
+            FROM shots {where}
+            GROUP BY club
+            ORDER BY club
+        """, params)
+        df = df.set_index('club')[aggregates.STATS].astype(float)
+        df.index = df.index.astype(object)
+        return df
+
+
+BACKENDS = {
+    'sql': SQLBackend,
+    'duckdb': DuckDBBackend,
+}
+
+
+def duckdb_type(column):
+    if isinstance(column.type, db.Date):
+        return 'DATE'
+    if isinstance(column.type, db.Boolean):
+        return 'BOOLEAN'
+    if isinstance(column.type, db.Float):
+        return 'DOUBLE'
+    if isinstance(column.type, db.Integer):
+        return 'BIGINT' if column.primary_key else 'INTEGER'
+    return 'VARCHAR'
+
+
+def cast_columns():
+    return ', '.join(f"CAST({c.name} AS {duckdb_type(c)}) AS {c.name}" for c in Shots.__table__.columns)
+
+
+def empty_select():
+    return 'SELECT ' + ', '.join(f"NULL::{duckdb_type(c)} AS {c.name}" for c in Shots.__table__.columns) + ' WHERE false'
+
+
+def typed_frame(df, ids):
+    """
+    Returns a DataFrame with the given ids and every other shots table
+    column, in nullable pandas types that DuckDB reads without guessing
+    """
+    out = {'id': ids}
+    for c in Shots.__table__.columns:
+        if c.primary_key:
+            continue
+        values = df[c.name].reset_index(drop=True) if c.name in df.columns else pd.Series([None]*len(df))
+        kind = duckdb_type(c)
+        if kind == 'DATE':
+            out[c.name] = pd.to_datetime(values)
+        elif kind == 'BOOLEAN':
+            out[c.name] = values.astype('boolean')
+        elif kind == 'DOUBLE':
+            out[c.name] = pd.to_numeric(values).astype('Float64')
+        elif kind == 'INTEGER':
+            out[c.name] = pd.to_numeric(values).astype('Int64')
+        else:
+            out[c.name] = values.astype(object).where(values.notna(), None)
+    return pd.DataFrame(out)
+
+
+def pandas_types(df):
+    """
+    Converts a DuckDB result to the dtypes pd.read_sql gives: int64 or
+    float64 with nan for integers, and datetime64[ns] for dates
+    """
+    converted = {}
+    for name, dtype in df.dtypes.items():
+        if dtype.kind == 'M':
+            converted[name] = df[name].astype('datetime64[ns]')
+        elif dtype.kind in 'iu' and isinstance(dtype, pd.api.extensions.ExtensionDtype):
+            converted[name] = df[name].to_numpy(dtype='float64', na_value=np.nan)
+        elif dtype.kind in 'iu':
+            converted[name] = df[name].astype('int64')
+    return df.assign(**converted)
+
+
+def sql_filters(clubs=None, start=None, end=None):
+    """
+    Returns (WHERE clause, parameters) of a club and date range filter
+    """
+    clauses, params = [], []
+    if clubs is not None:
+        clubs = [clubs] if isinstance(clubs, str) else list(clubs)
+        clauses.append(f"club IN ({', '.join('?' for _ in clubs)})")
+        params += clubs
+    if start is not None:
+        clauses.append("date >= ?")
+        params.append(pd.Timestamp(start).date())
+    if end is not None:
+        clauses.append("date <= ?")
+        params.append(pd.Timestamp(end).date())
+    return ('WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+
+class BackendStats:
+    """
+    Per-club statistics of a date range computed by a backend, in the form
+    aggregates.ClubAggregates takes as stats (like streaming.StatsSnapshot)
+    """
+
+    def __init__(self, backend, start=None, end=None, columns=STAT_COLUMNS):
+        self.backend = backend
+        self.start = start
+        self.end = end
+        self.columns = list(columns)
+        self._tables = {}
+
+    def describe(self, column):
+        if column not in self._tables:
+            self._tables[column] = self.backend.describe(column, start=self.start, end=self.end)
+        return self._tables[column]
+
+
+def cached_shots(backend, version, clubs=None, start=None, end=None, columns=None):
+    """
+    Same as backend.read_shots, but repeated queries return the same
+    DataFrame object until version changes, so the callbacks of a page
+    share one query and the aggregates built on it. The frame has the
+    compact dtypes of the shot store. When the backend computes statistics
+    itself, the aggregates of the frame use them.
+
+    version: Anything that changes when shots are added, e.g. ShotStore.version
+    """
+    key = (
+        id(backend),
+        version,
+        None if clubs is None else tuple([clubs] if isinstance(clubs, str) else clubs),
+        None if start is None else pd.Timestamp(start),
+        None if end is None else pd.Timestamp(end),
+        None if columns is None else tuple(columns),
+    )
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+
+    df = compact_frame(backend.read_shots(clubs, start, end, columns))
+    if backend.stats_in_database and clubs is None:
+        aggregates.get(df, version, BackendStats(backend, start, end))
+    _cache[key] = df
+    while len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return df
+
+
+def clear():
+    _cache.clear()
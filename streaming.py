@@ -0,0 +1,318 @@
+import copy
+import math
+
+import numpy as np
+import pandas as pd
+
+from aggregates import STATS
+
+# Distance columns that the shot store keeps online statistics for
+COLUMNS = ['total_distance', 'carry_distance']
+
+QUANTILES = [0.25, 0.5, 0.75]
+
+# Bin width of the quantile histograms, the distances are whole meters
+RESOLUTION = 1.0
+
+# Columns and windows (last N shots, None for all) that the shot store keeps
+# covariances for, the options of the confidence regions on the Home page
+COV_COLUMNS = ('total_distance', 'side')
+COV_WINDOWS = [None, 100, 50, 20]
+
+
+class Welford:
+    """
+    Running count, mean, variance, min and max with Welford's algorithm.
+    Batches are merged in at once (Chan et al.).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, x):
+        self.extend(np.array([x], dtype=float))
+
+    def extend(self, xs):
+        n = len(xs)
+        if not n:
+            return
+        mean = xs.mean()
+        m2 = ((xs - mean)**2).sum()
+        delta = mean - self.mean
+        total = self.count + n
+        self.m2 += m2 + delta**2 * self.count * n / total
+        self.mean += delta * n / total
+        self.count = total
+        self.min = min(self.min, xs.min())
+        self.max = max(self.max, xs.max())
+
+    @property
+    def var(self):
+        """
+        Sample variance, like pd.Series.var()
+        """
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def std(self):
+        return math.sqrt(self.var)
+
+
+class Histogram:
+    """
+    Counts of the values rounded to multiples of resolution, for quantiles
+    in bounded memory: it grows with the range of the values, not with
+    their number. Quantiles are within resolution/2 of the exact ones, and
+    exact for integer values with a resolution of 1.
+    """
+
+    def __init__(self, resolution=RESOLUTION):
+        self.resolution = resolution
+        self.bins = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+
+    def extend(self, xs):
+        bins = np.round(np.asarray(xs, dtype=float) / self.resolution).astype(np.int64)
+        self.bins, inverse = np.unique(np.concatenate([self.bins, bins]), return_inverse=True)
+        weights = np.concatenate([self.counts, np.ones(len(bins), dtype=np.int64)])
+        self.counts = np.bincount(inverse, weights=weights).astype(np.int64)
+
+    def quantile(self, p):
+        """
+        The p-quantile with linear interpolation, like np.percentile
+        """
+        cumulative = np.cumsum(self.counts)
+        n = int(cumulative[-1]) if len(cumulative) else 0
+        if not n:
+            return math.nan
+        position = p * (n - 1)
+        lo = math.floor(position)
+        hi = min(lo + 1, n - 1)
+        x_lo, x_hi = self.bins[np.searchsorted(cumulative, [lo, hi], side='right')] * self.resolution
+        return float(x_lo + (position - lo) * (x_hi - x_lo))
+
+
+class OnlineStats:
+    """
+    Incremental version of pd.Series.describe() for one club and column
+    """
+
+    def __init__(self, quantiles=QUANTILES):
+        self.moments = Welford()
+        self.histogram = Histogram()
+        self.quantiles = list(quantiles)
+
+    def update(self, x):
+        self.extend(np.array([x], dtype=float))
+
+    def extend(self, xs):
+        """
+        Adds an array of values without missing values
+        """
+        self.moments.extend(xs)
+        self.histogram.extend(xs)
+
+    def row(self):
+        """
+        Returns the values in the order of aggregates.STATS
+        """
+        m = self.moments
+        if m.count == 0:
+            return [0] + [math.nan]*7
+        return [m.count, m.mean, m.min] + [self.histogram.quantile(p) for p in self.quantiles] + [m.max, m.std]
+
+
+class WindowCov:
+    """
+    Means and covariance matrix of (x, y) pairs, over the last size pairs or
+    all of them if size is None.
+
+    Without a size only the count, means and co-moments are kept and new
+    pairs are merged in (Chan et al.), otherwise the window itself is kept.
+    """
+
+    def __init__(self, size=None):
+        self.size = size
+        self.count = 0
+        self.mean = np.zeros(2)
+        self.m2 = np.zeros((2, 2))
+        self.window = np.empty((0, 2))
+
+    def extend(self, xy):
+        """
+        Adds the rows of an (n, 2) array of pairs without missing values
+        """
+        xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        if not len(xy):
+            return
+        if self.size is None:
+            n = len(xy)
+            mean = xy.mean(axis=0)
+            d = xy - mean
+            delta = mean - self.mean
+            total = self.count + n
+            self.m2 = self.m2 + d.T @ d + np.outer(delta, delta) * self.count * n / total
+            self.mean = self.mean + delta * n / total
+            self.count = total
+        else:
+            self.window = np.concatenate([self.window, xy])[-self.size:]
+            self.count = len(self.window)
+            self.mean = self.window.mean(axis=0)
+            d = self.window - self.mean
+            self.m2 = d.T @ d
+
+    def update(self, x, y):
+        self.extend([[x, y]])
+
+    @property
+    def cov(self):
+        """
+        Sample covariance, like pd.DataFrame.cov()
+        """
+        if self.count < 2:
+            return np.full((2, 2), math.nan)
+        return self.m2 / (self.count - 1)
+
+
+class ClubCovariance:
+    """
+    WindowCov per club and window of the rows where both columns are present
+    """
+
+    def __init__(self, columns=COV_COLUMNS, windows=COV_WINDOWS):
+        self.columns = tuple(columns)
+        self.windows = list(windows)
+        self.covs = {}
+
+    def __contains__(self, key):
+        """
+        key: (tuple) (columns, window)
+        """
+        columns, window = key
+        return tuple(columns) == self.columns and window in self.windows
+
+    def _club(self, club):
+        if club not in self.covs:
+            self.covs[club] = {window: WindowCov(window) for window in self.windows}
+        return self.covs[club]
+
+    def update(self, club, x, y):
+        if x == x and y == y:
+            for cov in self._club(club).values():
+                cov.update(x, y)
+
+    def update_frame(self, df):
+        xy = np.column_stack([df[column].to_numpy(dtype=float, na_value=np.nan) for column in self.columns])
+        keep = ~np.isnan(xy).any(axis=1) & ~pd.isna(df['club']).to_numpy()
+        codes, clubs = pd.factorize(df['club'][keep], sort=False)
+        xy = xy[keep]
+        for i, club in enumerate(clubs):
+            rows = xy[codes == i]
+            for cov in self._club(club).values():
+                cov.extend(rows)
+
+    def get(self, club, window):
+        """
+        Returns the WindowCov of club, or None if it has no complete rows
+        """
+        return self.covs.get(club, {}).get(window)
+
+    def snapshot(self):
+        """
+        Returns a copy that is not changed by later updates. WindowCov
+        replaces its arrays on every update, so shallow copies are enough.
+        """
+        snapshot = copy.copy(self)
+        snapshot.covs = {club: {window: copy.copy(cov) for window, cov in covs.items()}
+                         for club, covs in self.covs.items()}
+        return snapshot
+
+
+class ClubStats:
+    """
+    Statistics per club and column, updated one batch of shots at a time
+    as shots are added to the shot store.
+
+    describe(column) returns the same table as
+    df.groupby('club').describe()[column]. The covariances of the
+    confidence regions are kept in covariance. ClubStats is changed in
+    place, readers get a StatsSnapshot, see snapshot().
+    """
+
+    def __init__(self, columns=COLUMNS):
+        self.columns = list(columns)
+        self.stats = {column: {} for column in self.columns}
+        self.covariance = ClubCovariance()
+        self._tables = {}
+
+    def _club(self, column, club):
+        if club not in self.stats[column]:
+            self.stats[column][club] = OnlineStats()
+        return self.stats[column][club]
+
+    def update(self, club, **values):
+        """
+        Adds one shot. Missing values are skipped, but the club still gets
+        a row in the tables.
+        """
+        for column in self.columns:
+            x = values.get(column)
+            stats = self._club(column, club)
+            if x is not None and x == x:
+                stats.update(float(x))
+        x, y = (values.get(column) for column in self.covariance.columns)
+        if x is not None and y is not None:
+            self.covariance.update(club, float(x), float(y))
+        self._tables.clear()
+
+    def update_frame(self, df):
+        """
+        Adds the shots of a DataFrame with a club column
+        """
+        present = ~pd.isna(df['club']).to_numpy()
+        codes, clubs = pd.factorize(df['club'][present], sort=False)
+        for column in self.columns:
+            values = df[column].to_numpy(dtype=float, na_value=np.nan)[present]
+            for i, club in enumerate(clubs):
+                x = values[codes == i]
+                self._club(column, club).extend(x[~np.isnan(x)])
+        self.covariance.update_frame(df)
+        self._tables.clear()
+
+    def describe(self, column):
+        if column not in self._tables:
+            clubs = sorted(self.stats[column])
+            rows = [self.stats[column][club].row() for club in clubs]
+            self._tables[column] = pd.DataFrame(
+                rows,
+                columns=STATS,
+                index=pd.Index(clubs, name='club'),
+            )
+        return self._tables[column]
+
+    def snapshot(self):
+        """
+        Returns a StatsSnapshot of the statistics as they are now. Should be
+        called with the shot store locked.
+        """
+        tables = {column: self.describe(column) for column in self.columns}
+        return StatsSnapshot(self.columns, tables, self.covariance.snapshot())
+
+
+class StatsSnapshot:
+    """
+    The statistics of a ClubStats at one point in time, given to
+    aggregates.ClubAggregates with the frame of the same shots
+    """
+
+    def __init__(self, columns, tables, covariance):
+        self.columns = list(columns)
+        self.tables = tables
+        self.covariance = covariance
+
+    def describe(self, column):
+        return self.tables[column]
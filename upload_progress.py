@@ -0,0 +1,66 @@
+import glob
+import hashlib
+import json
+import os
+import time
+import uuid
+
+# Directory of the progress files, overridden by the UPLOAD_PROGRESS_PATH
+# environment variable. Every worker process reads and writes the same files.
+DEFAULT_PATH = os.path.join('data', 'upload_progress')
+
+# Files not written for this many seconds were left by a worker that died
+STALE_SECONDS = 3600
+
+
+def progress_path():
+    return os.environ.get('UPLOAD_PROGRESS_PATH', DEFAULT_PATH)
+
+
+def _hash(value):
+    return hashlib.sha1(repr(value).encode()).hexdigest()[:16]
+
+
+def _file(page_id, filename, modified):
+    # Page ids come from the browser, only their hashes are used in paths
+    return os.path.join(progress_path(), f"{_hash(page_id)}-{_hash((filename, modified))}.json")
+
+
+def write(page_id, filename, modified, fraction, rows):
+    """
+    Saves the progress of one file being imported from a page. The file is
+    replaced at once, so readers never see half of it.
+    """
+    path = _file(page_id, filename, modified)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, 'w') as fp:
+        json.dump({'filename': filename, 'fraction': fraction, 'rows': rows}, fp)
+    os.replace(tmp, path)
+
+
+def remove(page_id, filename, modified):
+    try:
+        os.remove(_file(page_id, filename, modified))
+    except FileNotFoundError:
+        pass
+
+
+def read(page_id):
+    """
+    Returns [(filename, fraction, rows)] of the files being imported from
+    a page, sorted by filename
+    """
+    running = []
+    for path in glob.glob(os.path.join(progress_path(), f"{_hash(page_id)}-*.json")):
+        try:
+            if time.time() - os.path.getmtime(path) > STALE_SECONDS:
+                os.remove(path)
+                continue
+            with open(path) as fp:
+                entry = json.load(fp)
+        except (OSError, ValueError):
+            # Removed by the upload callback in the meantime
+            continue
+        running.append((entry['filename'], entry['fraction'], entry['rows']))
+    return sorted(running)
@@ -1,11 +1,11 @@
 import base64
-import datetime
-import io
 
 import numpy as np
 import pandas as pd
 from dash import html, dash_table
-from models import Shots
+import aggregates
+import ingest
+import spreadsheet
 
 club_enum = {
     '1W': '1 Wood',
@@ -28,24 +28,6 @@ def get_db_pw():
     return db_pw
 
 
-def get_rolling_values(df, club, column='total_distance', window_size=20, stat='stddev'):
-    """
-    Return list with statistic over rolling value
-    """
-    roll = df.groupby('club').get_group(club)[column].dropna().rolling(window_size)
-    if stat == 'stddev':
-        vals = roll.std().dropna().to_list()
-    elif stat == 'mean':
-        vals = roll.mean().dropna().to_list()
-    elif stat == 'median':
-        vals = roll.median().dropna().to_list()
-    else:
-        return None
-
-    date = df.groupby('club').get_group(club).loc[window_size+1:, 'date'].to_list()
-    return (vals, roll, date)
-
-
 def floor(val, n):
     return n*int(val/n)
 
@@ -79,7 +61,8 @@ def get_values(array, nvals):
 
 def get_clubs(df):
     # Get an ordered list of clubs, excluding clubs with no data
-    clubs = [club for club in club_enum.keys() if club in df.club.unique()]
+    agg = aggregates.get(df)
+    clubs = [club for club in club_enum.keys() if club in agg]
     clubs.reverse()
 
     clubmin = df.carry_distance.min() - 10
@@ -91,7 +74,7 @@ def longest_shot(df, d=0):
 
     distance = 'total_distance' if d==0 else 'carry_distance'
 
-    series = df.groupby('club').describe()[distance]['max']
+    series = aggregates.get(df).describe(distance)['max']
     club = series.idxmax()
     dist = int(series.max())
     return html.Div([
@@ -104,8 +87,9 @@ def most_shots(df):
     Get which golf club that have most logged shots.
     Return the string: <club_enum> (<num>)
     """
-    club = df.club.value_counts().idxmax()
-    freq = df.club.value_counts().max()
+    counts = aggregates.get(df).sizes
+    club = counts.idxmax()
+    freq = counts.max()
     return html.Div([
         html.H3(club_enum[club]),
         html.H3(f"#{freq}")
@@ -116,8 +100,10 @@ def fewest_shots(df):
     Get which golf club that have most logged shots.
     Return the string: <club_enum> (<num>)
     """
-    club = df.club.value_counts().idxmin()
-    freq = df.club.value_counts().min()
+    # Only clubs with shots, club is categorical
+    counts = aggregates.get(df).sizes
+    club = counts.idxmin()
+    freq = counts.min()
     return html.Div([
         html.H3(club_enum[club]),
         html.H3(f"#{freq}")
@@ -132,7 +118,10 @@ def biggest_var(df, d=0):
 
     distance = 'total_distance' if d==0 else 'carry_distance'
 
-    std = df.groupby('club').describe()[distance]['std']
+    std = aggregates.get(df).describe(distance)['std'].dropna()
+    if std.empty:
+        # Needs two shots with one club
+        return html.Div([html.H3("-")])
     club = std.idxmax()
     num = std.max()
     return html.Div([
@@ -149,7 +138,10 @@ def smallest_var(df, d=0):
 
     distance = 'total_distance' if d==0 else 'carry_distance'
 
-    std = df.groupby('club').describe()[distance]['std']
+    std = aggregates.get(df).describe(distance)['std'].dropna()
+    if std.empty:
+        # Needs two shots with one club
+        return html.Div([html.H3("-")])
     club = std.idxmin()
     num = std.min()
 
@@ -159,7 +151,7 @@ def smallest_var(df, d=0):
     ])
 
 def create_table(df, distance='total_distance'):
-    table_df = df.groupby('club').describe()[distance].reset_index().round(decimals=2)
+    table_df = aggregates.get(df).describe(distance).reset_index().round(decimals=2)
     table_df = table_df.astype({'mean': int, '25%': int, '50%': int, '75%': int})
 
     return dash_table.DataTable(
@@ -178,46 +170,36 @@ def create_table(df, distance='total_distance'):
     )
 
 
-def parse_file_upload(contents, filename, engine, session):
+# Uploads larger than this (in base64 characters) are imported a chunk at a
+# time with ingest.ingest_stream and are not shown in a table
+STREAM_THRESHOLD = 2**22
+
+
+def parse_file_upload(contents, filename, backend, progress=None):
+    """
+    Saves an uploaded csv or spreadsheet file and returns the response for
+    the Data page. progress is passed on to ingest.ingest_stream for large
+    csv files.
+
+    backend: Storage backend to save to, see storage.create_backend
+    """
 
     content_type, content_string = contents.split(',')
-    decoded = base64.b64decode(content_string)
 
-    # Only accept csv and xls files
-    if filename.split('.')[-1] == 'csv':
-        pass
-    elif 'xls' in filename.split('.')[-1] and False:
-        # Excel not supported yet
-        pass
-    else:
+    # Only accept csv, Excel and ODS files
+    kind = spreadsheet.file_type(filename)
+    if kind not in ('csv',) + spreadsheet.EXCEL_TYPES + spreadsheet.ODS_TYPES:
         return html.Div(
-            "Only csv are accepted",
+            "Only csv, xlsx and ods files are accepted",
             className="upload-error-message",
             )
 
-    # Check that the file have the expected columns
-    list_content = decoded.decode('utf-8').split('\n')
-    column_names = list_content[0].strip()
-    expected_columns = ['club', 'total_distance', 'carry_distance', 'date']
-    if not all([column in column_names for column in expected_columns]) or len(column_names.split(','))<4:
-        print([column in column_names for column in expected_columns])
-        print(column_names.split(','))
-        return html.Div(
-            f"The file did not have the expected columns",
-            className="upload-error-message",
-            )
+    if kind == 'csv' and len(content_string) > STREAM_THRESHOLD:
+        return stream_file_upload(content_string, backend, progress)
 
-    # Create table with data to display
+    decoded = base64.b64decode(content_string)
     try:
-        if filename.split('.')[-1] == 'csv':
-            # Assume that the user uploaded a CSV file
-            dff = pd.read_csv(
-                io.StringIO(decoded.decode('utf-8')))
-
-        elif 'xls' in filename.split('.')[-1]:
-            # Assume that the user uploaded an excel file
-            dff = pd.read_excel(io.BytesIO(decoded))
-
+        dff, errors, seconds = ingest.ingest(decoded, backend, kind=kind)
     except Exception as e:
         print(e)
         return html.Div(
@@ -225,37 +207,21 @@ def parse_file_upload(contents, filename, engine, session):
             className="upload-error-message"
             )
 
-    col_dict = dict(enumerate(column_names.split(',')))
-    n_columns = len(column_names.split(','))
-    for row in decoded.decode('utf-8').split('\n')[1:]:
-        print(f"row = {row}")
-        cells = row.strip().split(',')
-        entry = {col_dict[i]:cells[i] for i in range(n_columns)}
-
-        # Create new record
-        new_shot = Shots(
-            club = str(entry['club']),
-            total_distance = int(float(entry['total_distance'])) if entry['total_distance'] else None,
-            carry_distance = int(float(entry['carry_distance'])) if entry['carry_distance'] else None,
-            missed = bool(int(entry['missed'])) if entry['missed'] else None,
-            date = datetime.datetime.strptime(entry['date'], '%Y-%m-%d'),
-            ball_speed = int(float(entry['ball_speed'])) if entry['ball_speed'] else None,
-            launch_angle = int(float(entry['launch_angle'])) if entry['launch_angle'] else None,
-            height = int(float(entry['height'])) if entry['height'] else None,
-            impact_angle = int(float(entry['impact_angle'])) if entry['impact_angle'] else None,
-            hang_time = float(entry['hang_time']) if entry['hang_time'] else None,
-            curve = int(float(entry['curve'])) if entry['curve'] else None,
-            side = int(float(entry['side'])) if entry['side'] else None,
-        )
-        session.add(new_shot)
-    session.commit()
+    if errors:
+        return html.Div(
+            className="upload-error-message",
+            children=[html.P(error) for error in errors],
+            )
 
+    dff = dff.assign(date=dff.date.dt.strftime('%Y-%m-%d'))
+    rate = len(dff) / seconds if seconds else float('inf')
 
     return html.Div(className="table card", children=[
         html.H2(
         className = "upload-success-message",
         children = ["The following data was saved"],
         ),
+        html.P(f"{len(dff)} shots saved in {seconds:.2f} s ({rate:.0f} rows/sec)"),
         dash_table.DataTable(
             id="upload_table_id",
             data = dff.to_dict('records'),
@@ -274,9 +240,34 @@ def parse_file_upload(contents, filename, engine, session):
     ])
 
 
+def stream_file_upload(content_string, backend, progress=None):
+    try:
+        rows, errors, seconds = ingest.ingest_stream(content_string, backend, progress=progress)
+    except Exception as e:
+        print(e)
+        return html.Div(
+            'There was an error processing this file',
+            className="upload-error-message"
+            )
+
+    if errors:
+        return html.Div(
+            className="upload-error-message",
+            children=[html.P(error) for error in errors],
+            )
+
+    rate = rows / seconds if seconds else float('inf')
+    return html.Div(className="table card", children=[
+        html.H2(
+        className = "upload-success-message",
+        children = [f"{rows} shots were saved"],
+        ),
+        html.P(f"Saved in {seconds:.2f} s ({rate:.0f} rows/sec)"),
+    ])
+
+
 def get_cov(df, club):
-    dff = df.groupby('club').get_group(club)[['total_distance', 'side']].dropna()
-    return dff.cov()
+    return aggregates.get(df).cov(club)
 
 
 def f_norm(M):
@@ -288,45 +279,55 @@ def f_norm(M):
     return np.sqrt(np.sum(M**2))
 
 
-def get_ellipse(df, club, nvals=None, xcol='total_distance', ycol='side', p=0.95):
-    dff = df.groupby('club').get_group(club)[['total_distance', 'side']].dropna()
-
-    if nvals is None:
-        nvals = dff.side.count()
-    elif isinstance(nvals, int):
-        nvals = min(nvals, dff.side.count())
-    else:
-        nvals = dff.side.count()
-
-    # Scatter data
-    y = dff[ycol].to_numpy()[-nvals:]
-    x = dff[xcol].to_numpy()[-nvals:]
-    x_mean, y_mean = x.mean(), y.mean()
+def get_ellipses(df, clubs, nvals=None, xcol='total_distance', ycol='side', p=0.95):
+    """
+    Confidence ellipses of several clubs at once, over the last nvals shots
+    of every club with both xcol and ycol (all of them if nvals is None).
+    The covariances are eigendecomposed as one stacked array and the points
+    of all ellipses rotated with one matmul.
 
-    # Covariance, eigenvalues, eigenvectors
-    cov = dff.cov().to_numpy()
-    w, v = np.linalg.eigh(cov)
+    Returns {club: (X, Y, x, y)}, the ellipse points and the scatter data
+    """
+    agg = aggregates.get(df)
+    clubs = list(clubs)
+    if not clubs:
+        return {}
+    counts, means, covs = agg.window_cov(clubs, nvals, (xcol, ycol))
+
+    # Covariance, eigenvalues, eigenvectors. Clubs with fewer than two
+    # shots get an ellipse of one point.
+    covs = np.where(np.isnan(covs), 0, covs)
+    w, v = np.linalg.eigh(covs)
+    w = np.clip(w, 0, None)
 
     # Calculate Chi square value
     s = -2*np.log(1-p)
 
-    # Get ellipse points
+    # Get ellipse points, major axis along x
     t = np.linspace(0, 2*np.pi)
-    X = np.sqrt(w[1]*s)*np.cos(t)
-    Y = np.sqrt(w[0]*s)*np.sin(t)
-
-    # Rotation matrix
-    theta = np.arctan(v[w.argmax(), 1] / v[w.argmax(), 0])
-    R = np.array([
-        [np.cos(theta), -np.sin(theta)],
-        [np.sin(theta), np.cos(theta)]
-    ])
+    points = np.stack([
+        np.sqrt(w[:, 1:]*s)*np.cos(t),
+        np.sqrt(w[:, :1]*s)*np.sin(t),
+    ], axis=1)
+
+    # Rotation matrices, to the eigenvector of the largest eigenvalue (the
+    # last column of v)
+    theta = np.arctan2(v[:, 1, 1], v[:, 0, 1])
+    R = np.empty((len(clubs), 2, 2))
+    R[:, 0, 0] = np.cos(theta)
+    R[:, 0, 1] = -np.sin(theta)
+    R[:, 1, 0] = np.sin(theta)
+    R[:, 1, 1] = np.cos(theta)
 
     # Rotate elipse data
-    X_rot, Y_rot = [], []
-    for X_, Y_ in zip(X,Y):
-        x_temp, y_temp = np.dot(R, np.array([X_,Y_]))
-        X_rot.append(x_temp+x_mean)
-        Y_rot.append(y_temp+y_mean)
+    rotated = R @ points + np.nan_to_num(means)[:, :, None]
 
-    return (X_rot, Y_rot, x, y)
+    ellipses = {}
+    for i, club in enumerate(clubs):
+        xy = agg.pairs(club, (xcol, ycol), nvals)
+        ellipses[club] = (rotated[i, 0], rotated[i, 1], xy[:, 0], xy[:, 1])
+    return ellipses
+
+
+def get_ellipse(df, club, nvals=None, xcol='total_distance', ycol='side', p=0.95):
+    return get_ellipses(df, [club], nvals=nvals, xcol=xcol, ycol=ycol, p=p)[club]